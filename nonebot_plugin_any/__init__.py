@@ -5,12 +5,15 @@ from pathlib import Path
 from nonebot.log import logger
 from nonebot.plugin import PluginMetadata
 
+from .config import Config
+
 __plugin_meta__ = PluginMetadata(
     name="Nonebot2 Any 多平台服务",
     description="Nonebot2 多平台统一事件与消息统一构造发送",
     usage="提供多平台统一的事件接口与统一的消息构造发送",
     type="library",
     homepage="https://github.com/MelodyYuuka/nonebot-plugin-any",
+    config=Config,
     supported_adapters={
         "~onebot.v11",
         # "~qqguild",
@@ -24,10 +27,15 @@ from .event import AnyEvent as AnyEvent
 from .event import AnyGroupEvent as AnyGroupEvent
 from .event import AnyGroupMsgEvent as AnyGroupMsgEvent
 from .event import AnyMsgEvent as AnyMsgEvent
+from .batch import on_batch as on_batch
 from .message import AnyMsg as AnyMsg
+from .message import AnyMsgTemplate as AnyMsgTemplate
 from .models import Group as Group
+from .models import Target as Target
 from .models import User as User
+from .outbound import Priority as Priority
 from .utils import Platform as Platform
+from .utils.deadline import DeadlineExceeded as DeadlineExceeded
 from .utils import class_cmp
 
 for module_path in (Path(__file__).parent / "adapters").iterdir():
@@ -53,8 +61,20 @@ __all__ = (
     "AnyGroupMsgEvent",
     "AnyMsgEvent",
     "AnyMsg",
+    "AnyMsgTemplate",
+    "DeadlineExceeded",
+    "on_batch",
     "Platform",
+    "Priority",
+    "responder",
+    "sheddable",
+    "Target",
+    "worker_pool",
 )
 
 # 给 nb 打补丁
 from . import patch as patch
+from . import replay as replay
+from .dedup import responder as responder
+from .shedding import sheddable as sheddable
+from .workers import worker_pool as worker_pool
@@ -0,0 +1,25 @@
+"""
+说明：
+
+    进程池子进程的初始化脚本，由 `runpy.run_path` 以脚本方式执行，不经过包的导入
+
+    子进程反序列化任何插件内的对象都会先导入插件包，而插件包导入时需要已初始化的 NoneBot，
+    因此在此先以主进程传入的配置初始化 NoneBot 并加载插件
+
+    全局变量 ``config`` 与 ``scratch_dir`` 由 `init_globals` 传入
+
+"""
+
+import nonebot
+
+try:
+    nonebot.get_driver()
+except ValueError:
+    nonebot.init(driver="~none", **config)  # type: ignore # noqa: F821
+
+nonebot.require("nonebot_plugin_any")
+
+from nonebot_plugin_any.utils import media  # noqa: E402
+
+# 与主进程共用临时媒体目录，由主进程在关闭时清理
+media._scratch_dir = scratch_dir  # type: ignore # noqa: F821
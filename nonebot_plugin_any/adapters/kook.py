@@ -1,19 +1,36 @@
-from typing import Any, cast
+from pathlib import Path
+from typing import IO, Any, cast
 
 from nonebot.adapters.kaiheila import Adapter, Bot, Event
 from nonebot.adapters.kaiheila import Message as KookMsg
 from nonebot.adapters.kaiheila import MessageSegment as KookMsgSeg
 from nonebot.adapters.kaiheila.event import ChannelMessageEvent, MessageEvent
+from nonebot.adapters.kaiheila.exception import RateLimitException
+from nonebot.adapters.kaiheila.utils import escape_kmarkdown
 from nonebot.matcher import current_bot
 from typing_extensions import override
 
 from .. import AnyGroupMsgEvent, AnyMsgEvent
-from ..message import AnyMsgHandler, AnyMsgSeg
-from ..models import Group, User
-from ..utils import Platform, get_platform_bot, register_platform
+from ..config import plugin_config
+from ..message import AnyMsgHandler, AnyMsgSeg, NativeMedia, merge_text
+from ..models import Group, Target, User
+from ..serialize import register_event_encoder
+from ..utils import Platform, get_platform_bot, metrics, register_platform
+from ..utils.cache import upload_cache
 from ..utils.requests import Requests
 
-register_platform(Platform.KOOK, Bot, Adapter)
+register_platform(Platform.KOOK, Bot, Adapter, throttle=(RateLimitException,))
+
+
+def _encode_event(event: Event) -> dict[str, Any]:
+    data = event.dict(by_alias=True)
+    if isinstance(event, MessageEvent):
+        # event.content 已被解析为 Message，还原为平台原始内容
+        data["event"]["content"] = event.content
+    return data
+
+
+register_event_encoder(Event, _encode_event)
 
 
 class MsgEvent(AnyMsgEvent[MessageEvent]):
@@ -45,7 +62,7 @@ class MsgEvent(AnyMsgEvent[MessageEvent]):
 
     @override
     async def get_user_info(self) -> User:
-        if not self._user_info:
+        if not metrics.record_cache("user_info", self._user_info):
             bot = cast(Bot, current_bot.get())
             info = await bot.user_view(user_id=self.user_id)
             self._user_info = User(info.id_ or "", info.username or "", info.avatar)
@@ -60,6 +77,16 @@ class MsgEvent(AnyMsgEvent[MessageEvent]):
     def reply(self) -> None:
         return None
 
+    @property
+    @override
+    def message_id(self) -> str:
+        return self.event.msg_id
+
+    @property
+    @override
+    def time(self) -> float:
+        return self.event.msg_timestamp / 1000
+
 
 class GroupMsgEvent(AnyGroupMsgEvent[ChannelMessageEvent], MsgEvent):  # type: ignore
     @property
@@ -74,7 +101,7 @@ class GroupMsgEvent(AnyGroupMsgEvent[ChannelMessageEvent], MsgEvent):  # type: i
 
     @override
     async def get_group_info(self) -> Group:
-        if not self._group_info:
+        if not metrics.record_cache("group_info", self._group_info):
             bot = cast(Bot, current_bot.get())
             info = await bot.guild_view(guild_id=cast(str, self.event.extra.guild_id))
             self._group_info = Group(info.id_ or "", info.name or "", info.icon, info.user_id, None, None)
@@ -82,7 +109,7 @@ class GroupMsgEvent(AnyGroupMsgEvent[ChannelMessageEvent], MsgEvent):  # type: i
 
     @override
     async def get_channel_info(self) -> Group:
-        if not self._channel_info:
+        if not metrics.record_cache("channel_info", self._channel_info):
             bot = cast(Bot, current_bot.get())
             info = await bot.channel_view(target_id=self.channel_id)
             self._channel_info = Group(info.id_ or "", info.name or "", None, info.user_id, None, info.limit_amount)
@@ -97,39 +124,81 @@ class GroupMsgEvent(AnyGroupMsgEvent[ChannelMessageEvent], MsgEvent):  # type: i
         return cast(str, self.event.extra.channel_name)
 
 
+async def _upload_stream(bot: Bot, filename: str, file: IO[bytes]) -> str:
+    # 服务器会以文件内容识别的 mime 为准
+    result = await bot.call_api(
+        "asset/create", file=(filename, file, "application/octet-stream")
+    )
+    return result.url
+
+
 class MsgHandler(AnyMsgHandler[Bot, Event, KookMsg]):
     platform = Platform.KOOK
+    max_length = 8000
+    editable = True
 
     @override
     @classmethod
-    async def build(cls, msg: list[AnyMsgSeg]) -> list[KookMsg]:
-        msgs: list[KookMsg] = []
+    async def prepare(cls, seg: AnyMsgSeg, bot: Bot | None = None) -> AnyMsgSeg:
+        bot = bot or cast(Bot, get_platform_bot(Platform.KOOK))
+        file_key = await upload_cache.get_or_upload(
+            cls.platform, seg.data, cls._uploader(bot, seg.data), bot.self_id
+        )
+        return AnyMsgSeg(seg.type, NativeMedia(cls.platform, file_key))
+
+    @staticmethod
+    def _uploader(bot: Bot, data: Any):
+        async def upload() -> str:
+            # 网址与路径以文件流上传，避免整个文件读入内存
+            if isinstance(data, str) and data.startswith("http"):
+                async with Requests.download(
+                    data, max_memory=plugin_config.any_media_spool_threshold
+                ) as file:
+                    return await _upload_stream(bot, "upload-file", file)
+            if isinstance(data, Path):
+                with data.open("rb") as file:
+                    return await _upload_stream(bot, data.name, file)
+            return await bot.upload_file(data)
+
+        return upload
+
+    @override
+    @classmethod
+    def assemble(cls, msg: list[AnyMsgSeg]) -> KookMsg:
         result = KookMsg()
-        bot = None
-        for seg in msg:
+        for seg in merge_text(msg):
             match seg.type:
                 case "at":
                     result.append(KookMsgSeg.at(seg.data))
                 case "text":
-                    if result and result[-1].type == "text":
-                        result[-1].data["content"] += seg.data
-                    else:
-                        result.append(KookMsgSeg.text(seg.data))
-                case "image" | "voice":
-                    if not isinstance(bot, Bot):
-                        bot = cast(Bot, get_platform_bot(Platform.KOOK))
-                    data = seg.data
-                    if isinstance(data, str) and data.startswith("http"):
-                        data = (await Requests.get(data)).content
-                    file_key = await bot.upload_file(data)
+                    result.append(KookMsgSeg.text(seg.data))
+                case "image":
+                    result.append(KookMsgSeg.image(seg.data.ref))
+                case "voice":
+                    result.append(KookMsgSeg.file(seg.data.ref))
+        return result
+
+    @override
+    @classmethod
+    def parse(cls, msg: KookMsg) -> list[AnyMsgSeg]:
+        result = []
+        for seg in msg:
+            match seg.type:
+                case "text":
+                    result.append(AnyMsgSeg("text", seg.data["text"]))
+                case "kmarkdown":
+                    result.append(AnyMsgSeg("text", seg.data["raw_content"]))
+                case "mention":
+                    result.append(AnyMsgSeg("at", seg.data["user_id"]))
+                case "image" | "audio" | "file":
+                    # KOOK 的 file_key 即为资源网址；本插件以文件消息发送语音
+                    file_key = seg.data["file_key"]
+                    url = file_key if file_key.startswith("http") else None
+                    media = NativeMedia(cls.platform, file_key, url)
                     result.append(
-                        KookMsgSeg.image(file_key)
-                        if seg.type == "image"
-                        else KookMsgSeg.file(file_key)
+                        AnyMsgSeg("image" if seg.type == "image" else "voice", media)
                     )
-        if result:
-            msgs.append(result)
-        return msgs
+        return result
 
     @override
     @classmethod
@@ -143,4 +212,34 @@ class MsgHandler(AnyMsgHandler[Bot, Event, KookMsg]):
     ) -> Any:
         if at:
             msg = KookMsgSeg.at(event.user_id) + msg
-        await bot.send(event, msg, reply_sender=reply)
+        return await bot.send(event, msg, reply_sender=reply)
+
+    @override
+    @classmethod
+    def assemble_editable(cls, text: str) -> KookMsg:
+        # 平台只能修改 KMarkdown 与卡片消息
+        return KookMsg(KookMsgSeg.KMarkdown(escape_kmarkdown(text), text))
+
+    @override
+    @classmethod
+    async def edit(
+        cls, bot: Bot, event: Event, sent: Any, text: str, at: bool = False
+    ) -> None:
+        content = escape_kmarkdown(text)
+        if at:
+            content = f"(met){event.get_user_id()}(met){content}"
+        if isinstance(event, ChannelMessageEvent):
+            await bot.message_update(msg_id=sent.msg_id, content=content)
+        else:
+            await bot.directMessage_update(msg_id=sent.msg_id, content=content)
+
+    @override
+    @classmethod
+    async def send_to(cls, bot: Bot, target: Target, msg: KookMsg) -> Any:
+        if target.type == "private":
+            return await bot.send_msg(
+                message_type="private", user_id=target.id, message=msg
+            )
+        return await bot.send_msg(
+            message_type="channel", channel_id=target.id, message=msg
+        )
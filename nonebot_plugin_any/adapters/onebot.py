@@ -1,3 +1,5 @@
+import threading
+from pathlib import Path
 from typing import Any, Literal, cast
 
 from nonebot.adapters.onebot.v11 import Adapter, Bot, Event, GroupMessageEvent
@@ -9,9 +11,17 @@ from nonebot.matcher import current_bot
 from typing_extensions import override
 
 from .. import AnyGroupMsgEvent, AnyMsgEvent
-from ..message import AnyMsgHandler, AnyMsgSeg
-from ..models import Group, User
-from ..utils import Platform, register_platform
+from ..config import plugin_config
+from ..message import (
+    AnyMsgHandler,
+    AnyMsgSeg,
+    NativeMedia,
+    merge_text,
+    split_message,
+)
+from ..models import Group, Target, User
+from ..utils import Platform, metrics, register_platform
+from ..utils.media import encode_base64, media_spool, run_in_pool
 
 register_platform(Platform.OneBotV11, Bot, Adapter)
 
@@ -59,7 +69,7 @@ class MsgEvent(AnyMsgEvent[MessageEvent]):
 
     @override
     async def get_user_info(self) -> User:
-        if not self._user_info:
+        if not metrics.record_cache("user_info", self._user_info):
             sender = self.event.sender
             self._user_info = User(
                 str(sender.user_id or ""),
@@ -81,6 +91,16 @@ class MsgEvent(AnyMsgEvent[MessageEvent]):
     def reply(self) -> Reply | None:
         return self.event.reply
 
+    @property
+    @override
+    def message_id(self) -> str:
+        return str(self.event.message_id)
+
+    @property
+    @override
+    def time(self) -> float:
+        return float(self.event.time)
+
 
 class GroupMsgEvent(AnyGroupMsgEvent[GroupMessageEvent], MsgEvent):  # type: ignore
     @property
@@ -95,7 +115,7 @@ class GroupMsgEvent(AnyGroupMsgEvent[GroupMessageEvent], MsgEvent):  # type: ign
 
     @override
     async def get_group_info(self) -> Group:
-        if not self._group_info:
+        if not metrics.record_cache("group_info", self._group_info):
             bot = cast(Bot, current_bot.get())
             info = await bot.get_group_info(group_id=self.event.group_id)
             self._group_info = Group(
@@ -125,33 +145,87 @@ class GroupMsgEvent(AnyGroupMsgEvent[GroupMessageEvent], MsgEvent):  # type: ign
         return await self.get_group_name()
 
 
+def _file(data: str | NativeMedia) -> str:
+    return data.ref if isinstance(data, NativeMedia) else data
+
+
 class MsgHandler(AnyMsgHandler[Bot, Event, QQMsg]):
     platform = Platform.OneBotV11
+    max_length = 4500
 
     @override
     @classmethod
-    async def build(cls, msg: list[AnyMsgSeg]) -> list[QQMsg]:
-        msgs: list[QQMsg] = []
-        result = QQMsg()
+    async def prepare(cls, seg: AnyMsgSeg, bot: Bot | None = None) -> AnyMsgSeg:
+        data = seg.data
+        if isinstance(data, str):
+            return seg
+        mode = plugin_config.any_onebot_media_mode
+        # 由二进制数据落盘而来的媒体仍按二进制数据处理
+        from_bytes = not isinstance(data, Path) or bool(
+            seg.media and seg.media.from_bytes
+        )
+        if mode == "file" or (mode == "auto" and not from_bytes):
+            if not isinstance(data, Path):
+                data = await media_spool.write_scratch(data)
+            file = data.resolve().as_uri()
+        else:
+            cancel = threading.Event()
+            file = await run_in_pool(encode_base64, data, cancel, cancel=cancel)
+        return AnyMsgSeg(seg.type, NativeMedia(cls.platform, file))
+
+    @override
+    @classmethod
+    def partition(cls, msg: list[AnyMsgSeg]) -> list[list[AnyMsgSeg]]:
+        # 语音须单独成条发送
+        parts: list[list[AnyMsgSeg]] = [[]]
         for seg in msg:
+            if seg.type == "voice":
+                parts.append([seg])
+                parts.append([])
+            else:
+                parts[-1].append(seg)
+        return [
+            split
+            for part in parts
+            for split in split_message(
+                part, cls.max_length, cls.max_media, cls.media_types
+            )
+        ]
+
+    @override
+    @classmethod
+    def assemble(cls, msg: list[AnyMsgSeg]) -> QQMsg:
+        result = QQMsg()
+        for seg in merge_text(msg):
             match seg.type:
                 case "at":
                     result.append(QQMsgSeg.at(seg.data))
                 case "text":
-                    if result and result[-1].type == "text":
-                        result[-1].data["text"] += seg.data
-                    else:
-                        result.append(QQMsgSeg.text(seg.data))
+                    result.append(QQMsgSeg.text(seg.data))
                 case "image":
-                    result.append(QQMsgSeg.image(seg.data))
+                    result.append(QQMsgSeg.image(_file(seg.data)))
                 case "voice":
-                    if result:
-                        msgs.append(result)
-                        result = QQMsg()
-                    msgs.append(QQMsg(QQMsgSeg.record(seg.data)))
-        if result:
-            msgs.append(result)
-        return msgs
+                    result.append(QQMsgSeg.record(_file(seg.data)))
+        return result
+
+    @override
+    @classmethod
+    def parse(cls, msg: QQMsg) -> list[AnyMsgSeg]:
+        result = []
+        for seg in msg:
+            match seg.type:
+                case "text":
+                    result.append(AnyMsgSeg("text", seg.data["text"]))
+                case "at":
+                    result.append(AnyMsgSeg("at", str(seg.data["qq"])))
+                case "image" | "record":
+                    media = NativeMedia(
+                        cls.platform, seg.data["file"], seg.data.get("url")
+                    )
+                    result.append(
+                        AnyMsgSeg("image" if seg.type == "image" else "voice", media)
+                    )
+        return result
 
     @override
     @classmethod
@@ -163,4 +237,11 @@ class MsgHandler(AnyMsgHandler[Bot, Event, QQMsg]):
         at: bool = False,
         reply: bool = False,
     ) -> Any:
-        await bot.send(event, msg, at_sender=at, reply_message=reply)
+        return await bot.send(event, msg, at_sender=at, reply_message=reply)
+
+    @override
+    @classmethod
+    async def send_to(cls, bot: Bot, target: Target, msg: QQMsg) -> Any:
+        if target.type == "private":
+            return await bot.send_private_msg(user_id=int(target.id), message=msg)
+        return await bot.send_group_msg(group_id=int(target.id), message=msg)
@@ -1,3 +1,4 @@
+from datetime import datetime
 from pathlib import Path
 from typing import Any, cast
 
@@ -10,16 +11,17 @@ from nonebot.adapters.qq.event import (
     MessageCreateEvent,
     MessageEvent,
 )
+from nonebot.adapters.qq.exception import RateLimitException
 from nonebot.adapters.qq.models.guild import Message as MsgModel
 from nonebot.matcher import current_bot
 from typing_extensions import override
 
 from .. import AnyGroupMsgEvent, AnyMsgEvent
-from ..message import AnyMsgHandler, AnyMsgSeg
-from ..models import Group, User
-from ..utils import Platform, register_platform
+from ..message import AnyMsgHandler, AnyMsgSeg, merge_text
+from ..models import Group, Target, User
+from ..utils import Platform, metrics, register_platform
 
-register_platform(Platform.QQ, Bot, Adapter)
+register_platform(Platform.QQ, Bot, Adapter, throttle=(RateLimitException,))
 
 
 class MsgEvent(AnyMsgEvent[MessageEvent]):
@@ -74,6 +76,20 @@ class MsgEvent(AnyMsgEvent[MessageEvent]):
     def reply(self) -> MsgModel | None:
         return self.event.reply
 
+    @property
+    @override
+    def message_id(self) -> str | None:
+        return getattr(self.event, "id", None)
+
+    @property
+    @override
+    def time(self) -> float | None:
+        # 频道消息为 datetime，群聊与单聊消息为 ISO 8601 字符串
+        timestamp = getattr(self.event, "timestamp", None)
+        if isinstance(timestamp, str):
+            timestamp = datetime.fromisoformat(timestamp)
+        return timestamp.timestamp() if timestamp else None
+
 
 class GroupMsgEvent(AnyGroupMsgEvent[GroupAtMessageCreateEvent], MsgEvent):  # type: ignore
     @property
@@ -115,7 +131,7 @@ class GuildMsgEvent(AnyGroupMsgEvent[MessageCreateEvent], MsgEvent):  # type: ig
 
     @override
     async def get_group_info(self) -> Group:
-        if not self._group_info:
+        if not metrics.record_cache("group_info", self._group_info):
             bot = cast(Bot, current_bot.get())
             info = await bot.get_guild(guild_id=self.group_id)
             self._group_info = Group(
@@ -129,7 +145,7 @@ class GuildMsgEvent(AnyGroupMsgEvent[MessageCreateEvent], MsgEvent):  # type: ig
         return self._group_info
 
     async def get_channel_info(self) -> Group:
-        if not self._channel_info:
+        if not metrics.record_cache("channel_info", self._channel_info):
             bot = cast(Bot, current_bot.get())
             info = await bot.get_channel(channel_id=self.channel_id)
             self._channel_info = Group(
@@ -148,21 +164,20 @@ class GuildMsgEvent(AnyGroupMsgEvent[MessageCreateEvent], MsgEvent):  # type: ig
 
 class MsgHandler(AnyMsgHandler[Bot, MessageEvent, GuildMsg]):
     platform = Platform.QQ
+    max_length = 2000
+    max_media = 1  # 平台每条消息只发送一张图片
+    media_types = frozenset(("image",))  # 语音以文本占位发送，不计入媒体数量
 
     @override
     @classmethod
-    async def build(cls, msg: list[AnyMsgSeg]) -> list[GuildMsg]:
+    def assemble(cls, msg: list[AnyMsgSeg]) -> GuildMsg:
         result = GuildMsg()
-        for seg in msg:
+        for seg in merge_text(msg):
             match seg.type:
                 case "at":
                     result.append(GuildMsgSeg.mention_user(seg.data))
                 case "text":
-                    data = seg.data
-                    if result and result[-1].type == "text":
-                        result[-1].data["text"] += data
-                    else:
-                        result.append(GuildMsgSeg.text(data))
+                    result.append(GuildMsgSeg.text(seg.data))
                 case "image":
                     data = seg.data
                     if isinstance(data, str):
@@ -174,7 +189,27 @@ class MsgHandler(AnyMsgHandler[Bot, MessageEvent, GuildMsg]):
                         result.append(GuildMsgSeg.file_image(data))
                 case "voice":
                     result.append(GuildMsgSeg.text("[QQ频道不让我发语音]"))
-        return [result]
+        return result
+
+    @override
+    @classmethod
+    def parse(cls, msg: GuildMsg) -> list[AnyMsgSeg]:
+        # 收到的附件没有可复用的 id，按网址处理
+        result = []
+        for seg in msg:
+            match seg.type:
+                case "text":
+                    result.append(AnyMsgSeg("text", seg.data["text"]))
+                case "mention_user":
+                    result.append(AnyMsgSeg("at", seg.data["user_id"]))
+                case "image" | "audio":
+                    url = seg.data["url"]
+                    if "://" not in url:
+                        url = f"http://{url}"
+                    result.append(
+                        AnyMsgSeg("image" if seg.type == "image" else "voice", url)
+                    )
+        return result
 
     @override
     @classmethod
@@ -190,4 +225,15 @@ class MsgHandler(AnyMsgHandler[Bot, MessageEvent, GuildMsg]):
             msg = GuildMsgSeg.mention_user(int(event.author.id)) + msg  # type: ignore
         if reply:
             msg = GuildMsgSeg.reference(event.id) + msg  # type: ignore
-        await bot.send(event, msg)
+        return await bot.send(event, msg)
+
+    @override
+    @classmethod
+    async def send_to(cls, bot: Bot, target: Target, msg: GuildMsg) -> Any:
+        match target.type:
+            case "group":
+                return await bot.send_to_group(target.id, msg)
+            case "channel":
+                return await bot.send_to_channel(target.id, msg)
+            case "private":
+                return await bot.send_to_c2c(target.id, msg)
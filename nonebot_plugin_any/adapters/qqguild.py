@@ -10,9 +10,9 @@ from nonebot.matcher import current_bot
 from typing_extensions import override
 
 from .. import AnyGroupMsgEvent, AnyMsgEvent
-from ..message import AnyMsgHandler, AnyMsgSeg
+from ..message import AnyMsgHandler, AnyMsgSeg, merge_text
 from ..models import Group, User
-from ..utils import Platform, call_or_none, register_platform
+from ..utils import Platform, call_or_none, metrics, register_platform
 
 register_platform(Platform.QQGuild, Bot, Adapter)
 
@@ -46,7 +46,7 @@ class MsgEvent(AnyMsgEvent[MessageEvent]):
 
     @override
     async def get_user_info(self) -> User:
-        if not self._user_info:
+        if not metrics.record_cache("user_info", self._user_info):
             assert self.event.author
             self._user_info = User(self.user_id, self.name, await self.get_avatar_url())
         return self._user_info
@@ -60,6 +60,16 @@ class MsgEvent(AnyMsgEvent[MessageEvent]):
     def reply(self) -> MessageGet | None:
         return self.event.reply
 
+    @property
+    @override
+    def message_id(self) -> str | None:
+        return self.event.id
+
+    @property
+    @override
+    def time(self) -> float | None:
+        return self.event.timestamp.timestamp() if self.event.timestamp else None
+
 
 class GroupMsgEvent(AnyGroupMsgEvent[MessageCreateEvent], MsgEvent):  # type: ignore
     @property
@@ -74,7 +84,7 @@ class GroupMsgEvent(AnyGroupMsgEvent[MessageCreateEvent], MsgEvent):  # type: ig
 
     @override
     async def get_group_info(self) -> Group:
-        if not self._group_info:
+        if not metrics.record_cache("group_info", self._group_info):
             bot = cast(Bot, current_bot.get())
             info = await bot.get_guild(guild_id=int(self.group_id))
             self._group_info = Group(
@@ -88,7 +98,7 @@ class GroupMsgEvent(AnyGroupMsgEvent[MessageCreateEvent], MsgEvent):  # type: ig
         return self._group_info
 
     async def get_channel_info(self) -> Group:
-        if not self._channel_info:
+        if not metrics.record_cache("channel_info", self._channel_info):
             bot = cast(Bot, current_bot.get())
             info = await bot.get_channel(channel_id=int(self.channel_id))
             self._channel_info = Group(
@@ -112,21 +122,20 @@ class GroupMsgEvent(AnyGroupMsgEvent[MessageCreateEvent], MsgEvent):  # type: ig
 
 class MsgHandler(AnyMsgHandler[Bot, MessageEvent, GuildMsg]):
     platform = Platform.QQGuild
+    max_length = 2000
+    max_media = 1  # 平台每条消息只发送一张图片
+    media_types = frozenset(("image",))  # 语音以文本占位发送，不计入媒体数量
 
     @override
     @classmethod
-    async def build(cls, msg: list[AnyMsgSeg]) -> list[GuildMsg]:
+    def assemble(cls, msg: list[AnyMsgSeg]) -> GuildMsg:
         result = GuildMsg()
-        for seg in msg:
+        for seg in merge_text(msg):
             match seg.type:
                 case "at":
                     result.append(GuildMsgSeg.mention_user(seg.data))
                 case "text":
-                    data = seg.data
-                    if result and result[-1].type == "text":
-                        result[-1].data["text"] += data
-                    else:
-                        result.append(GuildMsgSeg.text(data))
+                    result.append(GuildMsgSeg.text(seg.data))
                 case "image":
                     data = seg.data
                     if isinstance(data, str):
@@ -138,7 +147,7 @@ class MsgHandler(AnyMsgHandler[Bot, MessageEvent, GuildMsg]):
                         result.append(GuildMsgSeg.file_image(data))
                 case "voice":
                     result.append(GuildMsgSeg.text("[QQ频道不让我发语音]"))
-        return [result]
+        return result
 
     @override
     @classmethod
@@ -154,4 +163,4 @@ class MsgHandler(AnyMsgHandler[Bot, MessageEvent, GuildMsg]):
             msg = GuildMsgSeg.mention_user(int(event.author.id)) + msg  # type: ignore
         if reply:
             msg = GuildMsgSeg.reference(event.id) + msg  # type: ignore
-        await bot.send(event, msg)
+        return await bot.send(event, msg)
@@ -0,0 +1,140 @@
+import asyncio
+from typing import Awaitable, Callable
+
+from nonebot import on_message
+from nonebot.log import logger
+from nonebot.rule import Rule
+from nonebot.typing import T_RuleChecker
+
+from .event import AnyGroupMsgEvent
+
+BatchFunc = Callable[[list[AnyGroupMsgEvent]], Awaitable[None]]
+
+
+class BatchConsumer:
+    """
+    说明：
+
+        按群聊 `channel_rich_id` 聚合消息事件，批量交给消费函数
+
+        每个群聊的缓冲达到 ``max_size`` 条或首条消息等待满 ``window`` 秒时提交一批，消费函数串行执行
+
+        尚未消费完的消息达到 ``max_pending`` 条时，新消息的事件处理将等待，直到消费函数跟上
+
+    参数:
+
+        * ``func``: 消费函数
+        * ``max_size``: 每批最大条数
+        * ``window``: 每批最长等待时间，单位: 秒
+        * ``max_pending``: 尚未消费完的最大消息数
+
+    """
+
+    def __init__(
+        self, func: BatchFunc, max_size: int, window: float, max_pending: int
+    ) -> None:
+        self.func = func
+        self.max_size = max(max_size, 1)
+        self.window = window
+        self._slots = asyncio.Semaphore(max(max_pending, self.max_size))
+        self._buffers: dict[str, list[AnyGroupMsgEvent]] = {}
+        self._timers: dict[str, asyncio.TimerHandle] = {}
+        self._batches: asyncio.Queue[list[AnyGroupMsgEvent]] = asyncio.Queue()
+        self._worker: asyncio.Task | None = None
+
+    async def add(self, event: AnyGroupMsgEvent) -> None:
+        """
+        说明：
+
+            加入一条消息，消费函数落后时等待
+
+        参数:
+
+            * ``event``: 群聊消息事件
+
+        """
+        await self._slots.acquire()
+        channel = event.channel_rich_id
+        buffer = self._buffers.setdefault(channel, [])
+        buffer.append(event)
+        if len(buffer) >= self.max_size:
+            self.flush(channel)
+        elif len(buffer) == 1:
+            self._timers[channel] = asyncio.get_running_loop().call_later(
+                self.window, self.flush, channel
+            )
+
+    def flush(self, channel: str) -> None:
+        """
+        说明：
+
+            立即提交该群聊缓冲中的消息
+
+        参数:
+
+            * ``channel``: 群聊 `channel_rich_id`
+
+        """
+        if timer := self._timers.pop(channel, None):
+            timer.cancel()
+        if batch := self._buffers.pop(channel, None):
+            self._batches.put_nowait(batch)
+            if self._worker is None or self._worker.done():
+                self._worker = asyncio.create_task(self._consume())
+
+    async def _consume(self) -> None:
+        while not self._batches.empty():
+            batch = self._batches.get_nowait()
+            try:
+                await self.func(batch)
+            except Exception as e:
+                logger.opt(exception=e).error(f"批量消费 {self.func} 出错")
+            finally:
+                for _ in batch:
+                    self._slots.release()
+
+
+def on_batch(
+    rule: Rule | T_RuleChecker | None = None,
+    *,
+    max_size: int = 50,
+    window: float = 5,
+    max_pending: int = 1000,
+    priority: int = 1,
+) -> Callable[[BatchFunc], BatchConsumer]:
+    """
+    说明：
+
+        注册批量消费函数，按群聊接收 `list[AnyGroupMsgEvent]`
+
+        不阻断事件传播，其他事件响应器照常处理这些消息
+
+    参数:
+
+        * ``rule``: 事件响应规则
+        * ``max_size``: 每批最大条数
+        * ``window``: 每批最长等待时间，单位: 秒
+        * ``max_pending``: 尚未消费完的最大消息数，超过后新消息的事件处理将等待
+        * ``priority``: 事件响应器优先级
+
+    用法:
+
+        ```python
+        @on_batch(max_size=100, window=10)
+        async def _(events: list[AnyGroupMsgEvent]):
+            ...
+        ```
+
+    """
+
+    def decorator(func: BatchFunc) -> BatchConsumer:
+        consumer = BatchConsumer(func, max_size, window, max_pending)
+        matcher = on_message(rule, priority=priority, block=False, _depth=1)
+
+        @matcher.handle()
+        async def _(event: AnyGroupMsgEvent):
+            await consumer.add(event)
+
+        return consumer
+
+    return decorator
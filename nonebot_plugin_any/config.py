@@ -0,0 +1,83 @@
+from pathlib import Path
+from typing import Literal
+
+from nonebot import get_driver
+from pydantic import BaseModel, Extra
+
+
+class Config(BaseModel, extra=Extra.ignore):
+    """
+    说明：
+
+        插件配置
+
+    """
+
+    any_upload_cache_size: int = 1024
+    "上传缓存最大条目数"
+    any_upload_cache_file: Path | None = None
+    "上传缓存持久化文件，为空则不持久化"
+    any_media_concurrency: int = 4
+    "构建消息时单条消息内媒体并发准备（下载、上传）的最大数量"
+    any_media_spool_threshold: int = 1 << 20
+    "媒体数据保留在内存中的最大字节数，超过后在构建时写入临时文件"
+    any_media_dir: Path | None = None
+    "临时媒体目录的上级目录，为空则使用系统临时目录"
+    any_media_spool_quota: int = 512 << 20
+    "临时媒体目录的总大小配额，超出时淘汰久未使用的内容寻址临时文件，仍超出则二进制媒体保留在内存中"
+    any_media_workers: int = 4
+    "媒体读取、编码线程池的线程数"
+    any_media_queue_size: int = 32
+    "媒体线程池中排队任务的最大数量"
+    any_onebot_media_mode: Literal["auto", "base64", "file"] = "auto"
+    """
+    OneBot 本地媒体的传递方式
+
+        - `auto`: 路径以 file:// 传递，二进制数据以 base64 传递
+        - `base64`: 全部以 base64 传递，适用于 OneBot 实现与 NoneBot 不在同一文件系统
+        - `file`: 全部以 file:// 传递，二进制数据先写入临时文件，须共享文件系统
+    """
+
+    any_outbound_rate: dict[str, float] = {}
+    "各平台每秒最多发送的消息数，键为平台名（如 `KOOK`、`QQ`），未设置的平台不限速"
+    any_outbound_burst: int = 5
+    "限速时允许的突发消息数"
+    any_outbound_aging: float = 10
+    "低优先级消息每排队该秒数提升一级优先级，为 0 则严格按优先级"
+    any_outbound_coalesce_window: float = 0
+    "合并同一目标连续短文本消息的等待时间，单位: 秒，为 0 则不合并"
+    any_outbound_coalesce_length: int = 100
+    "可被合并的短文本消息的最大长度"
+    any_stream_interval: float = 1
+    "流式发送时两次更新之间的最小间隔，单位: 秒"
+    any_bot_strategy: Literal["round_robin", "least_outstanding", "health"] = "health"
+    """
+    同一平台有多个 Bot 时，不依赖事件的调用（上传、主动发送等）选择 Bot 的策略
+
+        - `round_robin`: 轮流选择
+        - `least_outstanding`: 选择进行中 API 调用最少的
+        - `health`: 综合最近失败率与进行中 API 调用数
+    """
+    any_bot_throttle_cooldown: float = 30
+    "Bot 触发平台限流后暂停选择它的时间，单位: 秒"
+    any_dedup_window: float = 0
+    "入站消息去重的时间窗口，单位: 秒，为 0 则不去重（默认）"
+    any_dedup_size: int = 4096
+    "入站消息去重记录的最大条目数"
+    any_shed_lag: float = 0.5
+    "事件循环延迟超过该秒数时视为过载，为 0 则不检查"
+    any_shed_inflight: int = 0
+    "进行中的事件响应器超过该数量时视为过载，为 0 则不检查"
+    any_shed_channel_inflight: int = 0
+    "同一群聊进行中的事件响应器超过该数量时视该群聊过载，为 0 则不检查"
+    any_shed_defer: float = 5
+    "推迟模式下最多推迟的秒数，仍过载则丢弃"
+    any_record_dir: Path | None = None
+    "录制收到的平台事件到该目录，为空则不录制"
+    any_record_segment: int = 10000
+    "每个录制分段文件的最大事件数"
+    any_metrics_path: str | None = None
+    "以 Prometheus 文本格式提供指标的 HTTP 路径，如 `/metrics`，为空则不提供"
+
+
+plugin_config = Config.parse_obj(get_driver().config)
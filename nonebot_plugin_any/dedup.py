@@ -0,0 +1,128 @@
+import hashlib
+import time
+
+import nonebot
+from nonebot.adapters import Bot as BaseBot
+from nonebot.adapters import Event
+from nonebot.exception import IgnoredException
+from nonebot.log import logger
+from nonebot.message import event_preprocessor
+from nonebot.rule import Rule
+
+from .config import plugin_config
+from .event import AnyGroupEvent, AnyGroupMsgEvent, AnyMsgEvent
+from .utils.cache import LRUCache
+
+
+def _digest(any_event: AnyMsgEvent, sent: float | None = None) -> str:
+    return hashlib.blake2b(
+        f"{any_event.user_id}\0{sent}\0{any_event.message}".encode(), digest_size=16
+    ).hexdigest()
+
+
+class Deduplicator:
+    """
+    说明：
+
+        入站消息去重
+
+        同一条消息被多个 Bot 收到（如多个账号在同一群聊），或被平台重复投递（如重连后）时，只处理第一次
+
+        群聊消息以群聊 `channel_rich_id` 加发送者、消息内容与发送时间的摘要为键，不依赖各账号分配不同的消息 id；
+        其余以平台消息 id（平台未提供时为消息内容摘要）为键，私聊各 Bot 独立
+
+        默认不启用，设置 `any_dedup_window` 后启用
+
+    参数:
+
+        * ``window``: 时间窗口，单位: 秒
+        * ``maxsize``: 最大条目数
+
+    """
+
+    def __init__(self, window: float, maxsize: int) -> None:
+        self.window = window
+        self._seen: LRUCache[str, float] = LRUCache(maxsize)
+
+    @staticmethod
+    def key(bot: BaseBot, any_event: AnyMsgEvent) -> str:
+        "计算消息的去重键"
+        if isinstance(any_event, AnyGroupMsgEvent):
+            # 消息 id 可能按账号分配（如 OneBot），多个 Bot 收到的同一条消息 id 不同
+            scope = any_event.channel_rich_id
+            if (sent := any_event.time) is not None:
+                return f"{scope}:fp:{_digest(any_event, sent)}"
+        else:
+            scope = f"{any_event.user_rich_id}@{bot.self_id}"
+        if (message_id := any_event.message_id) is not None:
+            return f"{scope}:id:{message_id}"
+        return f"{scope}:blake2:{_digest(any_event)}"
+
+    def seen(self, key: str) -> bool:
+        """
+        说明：
+
+            检查并记录，时间窗口内已记录过时返回 True
+
+        参数:
+
+            * ``key``: 去重键
+
+        """
+        now = time.monotonic()
+        if (expires := self._seen.get(key)) is not None and expires > now:
+            return True
+        self._seen.set(key, now + self.window)
+        return False
+
+    def clear(self) -> None:
+        "清空去重记录"
+        self._seen.clear()
+
+
+deduplicator = Deduplicator(plugin_config.any_dedup_window, plugin_config.any_dedup_size)
+
+_responders: LRUCache[str, str] = LRUCache(plugin_config.any_dedup_size)
+
+
+async def _is_responder(bot: BaseBot, event: Event) -> bool:
+    try:
+        any_event = AnyGroupEvent.solve(event)
+    except KeyError:
+        return True
+    if any_event is None:
+        return True
+    channel = any_event.channel_rich_id
+    responder = _responders.get(channel)
+    if responder is None or responder not in nonebot.get_bots():
+        _responders.set(channel, responder := bot.self_id)
+    return responder == bot.self_id
+
+
+responder = Rule(_is_responder)
+"""
+说明：
+
+    每个群聊只由一个 Bot 响应：首个收到该群聊事件的 Bot 成为响应者，断开连接后由下一个收到事件的 Bot 接替
+
+用法:
+
+    ```python
+    matcher = on_notice(rule=responder)
+    ```
+"""
+
+
+@event_preprocessor
+async def _(bot: BaseBot, event: Event):
+    if deduplicator.window <= 0:
+        return
+    try:
+        any_event = AnyMsgEvent.solve(event)
+    except KeyError:
+        return
+    if any_event is None:
+        return
+    if deduplicator.seen(key := deduplicator.key(bot, any_event)):
+        logger.debug(f"忽略重复消息 {key}")
+        raise IgnoredException("重复消息")
@@ -1,5 +1,6 @@
 import abc
 import inspect
+import time
 from collections import defaultdict
 from types import GenericAlias
 from typing import Any, ClassVar, Generic, TypeVar, get_args, get_origin
@@ -9,6 +10,7 @@ from nonebot.log import logger
 
 from .models import Group, User
 from .utils import Platform
+from .utils import metrics
 
 TE = TypeVar("TE", bound=Event)
 
@@ -59,6 +61,17 @@ class AnyEvent(abc.ABC, Generic[TE]):
 
     @classmethod
     def solve(cls, event: Event):
+        start = time.perf_counter()
+        result = cls._solve(event)
+        metrics.event_solve.observe(
+            time.perf_counter() - start,
+            cls.__name__,
+            "miss" if result is None else "hit",
+        )
+        return result
+
+    @classmethod
+    def _solve(cls, event: Event):
         if anycls := cls._event_map[cls].get(type(event)):
             return anycls(event)
         for anyevent in cls._subevent_list[cls]:
@@ -128,6 +141,16 @@ class AnyMsgEvent(AnyEvent[TE]):
         "回复，各平台实现不同"
         raise NotImplementedError
 
+    @property
+    def message_id(self) -> str | None:
+        "平台消息 id，同一条消息重复投递时相同，平台未提供时为 None"
+        return None
+
+    @property
+    def time(self) -> float | None:
+        "消息发送时间，Unix 时间戳，单位: 秒，同一条消息被多个 Bot 收到时相同，平台未提供时为 None"
+        return None
+
     @property
     def user_rich_id(self) -> str:
         "含平台名的用户 id"
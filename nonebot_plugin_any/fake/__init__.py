@@ -0,0 +1,230 @@
+import asyncio
+import importlib
+import itertools
+import random
+from collections import Counter, deque
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Any, ClassVar
+
+import nonebot
+from nonebot.adapters import Adapter as BaseAdapter
+from nonebot.adapters import Bot as BaseBot
+from nonebot.exception import ActionFailed
+
+from ..utils import NotSupportException, Platform, get_platform_adapter
+
+
+@dataclass
+class FakeCall:
+    "一次模拟的 API 调用"
+
+    api: str
+    "API 名称"
+    data: dict[str, Any]
+    "调用参数"
+    time: float
+    "调用时间（事件循环时间）"
+
+
+class FakeApi:
+    """
+    说明：
+
+        模拟的平台 API：记录每次调用，按配置模拟延迟、失败与限流
+
+        可以通过 ``results`` 按 API 名称指定结果：为异常时抛出，可调用时以调用参数调用取其返回值，否则直接返回
+
+    参数:
+
+        * ``latency``: 每次调用的延迟，单位: 秒，为 (最小, 最大) 时在区间内随机
+        * ``error_rate``: 随机失败的概率
+        * ``rate``: 每秒最多调用次数，超出时抛出平台的限流异常，为 0 则不限
+        * ``burst``: 限流时允许的突发调用数
+        * ``history``: 保留的调用记录数
+        * ``seed``: 随机种子，相同配置与调用顺序下结果可复现
+
+    """
+
+    def __init__(
+        self,
+        latency: float | tuple[float, float] = 0,
+        error_rate: float = 0,
+        rate: float = 0,
+        burst: int = 1,
+        history: int = 10000,
+        seed: int = 0,
+    ) -> None:
+        self.latency = latency
+        self.error_rate = error_rate
+        self.rate = rate
+        self.burst = max(burst, 1)
+        self.calls: deque[FakeCall] = deque(maxlen=history)
+        "最近的调用记录"
+        self.counts: Counter[str] = Counter()
+        "各 API 的调用次数"
+        self.results: dict[str, Any] = {}
+        "按 API 名称指定的结果"
+        self._random = random.Random(seed)
+        self._ids = itertools.count(1)
+        self._tokens = float(self.burst)
+        self._updated: float | None = None
+
+    def next_id(self) -> int:
+        "下一个自增 id，用于生成消息 id 等"
+        return next(self._ids)
+
+    def _delay(self) -> float:
+        if isinstance(self.latency, tuple):
+            return self._random.uniform(*self.latency)
+        return self.latency
+
+    def _throttled(self, now: float) -> bool:
+        if self.rate <= 0:
+            return False
+        if self._updated is not None:
+            self._tokens = min(
+                self.burst, self._tokens + (now - self._updated) * self.rate
+            )
+        self._updated = now
+        if self._tokens < 1:
+            return True
+        self._tokens -= 1
+        return False
+
+    def _failed(self) -> bool:
+        return self.error_rate > 0 and self._random.random() < self.error_rate
+
+
+class FakeBot(BaseBot):
+    """
+    说明：
+
+        模拟 Bot 的基类，各平台的模拟 Bot 同时继承该平台的 Bot 类
+
+        平台 API 调用不发出网络请求，而是交给 ``fake`` 模拟；NoneBot 的 API 调用钩子照常运行
+
+    """
+
+    send_apis: ClassVar[frozenset[str]] = frozenset()
+    "表示发送消息的 API 名称"
+
+    fake: FakeApi
+    "模拟的平台 API"
+
+    @property
+    def sent(self) -> list[FakeCall]:
+        "最近的发送消息调用"
+        return [call for call in self.fake.calls if call.api in self.send_apis]
+
+    def fake_api_name(self, api: str) -> str:
+        "将 API 名称规范化，调用记录与 ``results`` 均使用规范化后的名称"
+        return api
+
+    def fake_result(self, api: str, data: dict[str, Any]) -> Any:
+        "生成模拟的调用结果，类型与平台 API 一致"
+        return None
+
+    def fake_error(self, throttled: bool = False) -> Exception:
+        "生成模拟的平台异常，默认为通用的 `ActionFailed`，各平台应覆盖为该平台的异常类型"
+        return ActionFailed(
+            self.adapter.get_name(), "模拟限流" if throttled else "模拟失败"
+        )
+
+    async def _fake_call(self, api: str, data: dict[str, Any]) -> Any:
+        fake = self.fake
+        api = self.fake_api_name(api)
+        loop = asyncio.get_running_loop()
+        fake.calls.append(FakeCall(api, data, loop.time()))
+        fake.counts[api] += 1
+        if delay := fake._delay():
+            await asyncio.sleep(delay)
+        if fake._throttled(loop.time()):
+            raise self.fake_error(throttled=True)
+        if fake._failed():
+            raise self.fake_error()
+        if api not in fake.results:
+            return self.fake_result(api, data)
+        result = fake.results[api]
+        if isinstance(result, Exception):
+            raise result
+        return result(data) if callable(result) else result
+
+
+class _FakeAdapter:
+    # 代理真实的 Adapter，仅将 API 调用交给模拟 Bot
+    def __init__(self, adapter: BaseAdapter) -> None:
+        self._adapter = adapter
+
+    def __getattr__(self, name: str) -> Any:
+        return getattr(self._adapter, name)
+
+    async def _call_api(self, bot: FakeBot, api: str, **data: Any) -> Any:
+        return await bot._fake_call(api, data)
+
+
+platform2fake: dict[Platform, type[FakeBot]] = {}
+
+
+def register_fake(platform: Platform, bot: type[FakeBot]) -> None:
+    """
+    说明：
+
+        注册平台的模拟 Bot
+
+    参数:
+
+        * ``platform``: 平台
+        * ``bot``: 模拟 Bot 类，以 ``(adapter, self_id)`` 构造
+
+    """
+    platform2fake[platform] = bot
+
+
+def fake_bot(
+    platform: Platform, self_id: str = "10000", connect: bool = True, **kwargs: Any
+) -> FakeBot:
+    """
+    说明：
+
+        创建该平台的模拟 Bot，须已注册该平台的 Adapter
+
+    参数:
+
+        * ``platform``: 平台
+        * ``self_id``: Bot id
+        * ``connect``: 是否连接到 NoneBot，连接后可被 `get_platform_bot` 等选中
+        * ``kwargs``: 传递给 `FakeApi` 的参数
+
+    用法:
+
+        ```python
+        bot = fake_bot(Platform.KOOK, latency=(0.05, 0.2), rate=5, burst=5)
+        await AnyMsg("hi").image(Path("a.png")).broadcast([Target(Platform.KOOK, "123")])
+        print(bot.sent, bot.fake.counts)
+        ```
+
+    """
+    try:
+        bot_cls = platform2fake[platform]
+    except KeyError:
+        raise NotSupportException("该平台没有模拟 Bot") from None
+    try:
+        adapter = nonebot.get_adapter(get_platform_adapter(platform))
+    except ValueError:
+        raise NotSupportException("该平台的 Adapter 未注册") from None
+    bot = bot_cls(adapter, self_id)  # type: ignore
+    bot.adapter = _FakeAdapter(adapter)  # type: ignore
+    bot.fake = FakeApi(**kwargs)
+    if connect:
+        adapter.bot_connect(bot)
+    return bot
+
+
+for module_path in Path(__file__).parent.iterdir():
+    if module_path.stem.startswith("_") or module_path.suffix != ".py":
+        continue
+    try:
+        importlib.import_module(f"{__package__}.{module_path.stem}")
+    except ImportError:
+        pass
@@ -0,0 +1,70 @@
+import json
+import re
+import time
+from typing import Any
+
+from nonebot.adapters.kaiheila import Adapter, Bot
+from nonebot.adapters.kaiheila.api.handle import get_api_restype
+from nonebot.adapters.kaiheila.exception import ActionFailed, RateLimitException
+from nonebot.drivers import Response
+from pydantic import BaseModel
+from typing_extensions import override
+
+from ..utils import Platform
+from . import FakeBot, register_fake
+
+
+def _response(status_code: int, message: str) -> Response:
+    return Response(status_code, content=json.dumps({"message": message}))
+
+
+class FakeKookBot(FakeBot, Bot):
+    send_apis = frozenset({"message/create", "direct-message/create"})
+
+    def __init__(self, adapter: Adapter, self_id: str) -> None:
+        super().__init__(adapter, self_id, f"fake{self_id}", "")
+
+    @override
+    def fake_api_name(self, api: str) -> str:
+        # 与 Adapter 的规范化一致，如 `directMessage_create` -> `direct-message/create`
+        api = re.sub(r"[A-Z]", lambda m: "-" + m.group().lower(), api)
+        return api.replace("_", "/").removeprefix("/api/v3/").strip("/")
+
+    @override
+    def fake_result(self, api: str, data: dict[str, Any]) -> Any:
+        fields: dict[str, Any] = {}
+        if api in self.send_apis:
+            fields = {
+                "msg_id": f"fake-{self.fake.next_id()}",
+                "msg_timestamp": int(time.time() * 1000),
+                "nonce": data.get("nonce", ""),
+            }
+        elif api == "asset/create":
+            fields = {"url": f"https://img.kookapp.cn/fake/{self.fake.next_id()}"}
+        elif api == "user/view":
+            user_id = data.get("user_id", "")
+            fields = {"id": user_id, "username": f"user{user_id}", "avatar": None}
+        elif api == "guild/view":
+            guild_id = data.get("guild_id", "")
+            fields = {"id": guild_id, "name": f"guild{guild_id}", "user_id": ""}
+        elif api == "channel/view":
+            channel_id = data.get("target_id", "")
+            fields = {
+                "id": channel_id,
+                "name": f"channel{channel_id}",
+                "user_id": "",
+                "limit_amount": 0,
+            }
+        restype = get_api_restype(api)
+        if isinstance(restype, type) and issubclass(restype, BaseModel):
+            return restype.construct(**fields)
+        return None
+
+    @override
+    def fake_error(self, throttled: bool = False) -> Exception:
+        if throttled:
+            return RateLimitException(_response(429, "模拟限流"))
+        return ActionFailed(_response(500, "模拟失败"))
+
+
+register_fake(Platform.KOOK, FakeKookBot)
@@ -0,0 +1,49 @@
+from typing import Any
+
+from nonebot.adapters.onebot.v11 import Bot
+from nonebot.adapters.onebot.v11.exception import ActionFailed
+from typing_extensions import override
+
+from ..utils import Platform
+from . import FakeBot, register_fake
+
+
+class FakeOneBot(FakeBot, Bot):
+    send_apis = frozenset({"send_msg", "send_group_msg", "send_private_msg"})
+
+    @override
+    def fake_result(self, api: str, data: dict[str, Any]) -> Any:
+        if api in self.send_apis:
+            return {"message_id": self.fake.next_id()}
+        if api == "get_group_info":
+            group_id = data.get("group_id", 0)
+            return {
+                "group_id": group_id,
+                "group_name": f"group{group_id}",
+                "member_count": 0,
+                "max_member_count": 0,
+            }
+        if api == "get_stranger_info":
+            user_id = data.get("user_id", 0)
+            return {"user_id": user_id, "nickname": f"user{user_id}"}
+        if api == "get_group_member_info":
+            user_id = data.get("user_id", 0)
+            return {
+                "group_id": data.get("group_id", 0),
+                "user_id": user_id,
+                "nickname": f"user{user_id}",
+                "card": "",
+                "role": "member",
+            }
+        return {}
+
+    @override
+    def fake_error(self, throttled: bool = False) -> Exception:
+        return ActionFailed(
+            status="failed",
+            retcode=1400,
+            msg="模拟限流" if throttled else "模拟失败",
+        )
+
+
+register_fake(Platform.OneBotV11, FakeOneBot)
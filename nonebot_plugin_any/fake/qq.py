@@ -0,0 +1,71 @@
+import json
+import time
+from typing import Any, get_type_hints
+
+from nonebot.adapters.qq import Adapter, Bot
+from nonebot.adapters.qq.config import BotInfo
+from nonebot.adapters.qq.exception import ActionFailed, RateLimitException
+from nonebot.drivers import Response
+from pydantic import BaseModel
+from typing_extensions import override
+
+from ..utils import Platform
+from . import FakeBot, register_fake
+
+
+def _response(status_code: int, message: str) -> Response:
+    return Response(status_code, content=json.dumps({"message": message}))
+
+
+class FakeQQBot(FakeBot, Bot):
+    send_apis = frozenset(
+        {
+            "post_messages",
+            "post_dms_messages",
+            "post_group_messages",
+            "post_c2c_messages",
+        }
+    )
+
+    def __init__(self, adapter: Adapter, self_id: str) -> None:
+        super().__init__(adapter, self_id, BotInfo(id=self_id, token="", secret=""))
+
+    @override
+    def fake_result(self, api: str, data: dict[str, Any]) -> Any:
+        fields: dict[str, Any] = {}
+        if api in self.send_apis:
+            fields = {
+                "id": f"fake-{self.fake.next_id()}",
+                "timestamp": int(time.time()),
+                "channel_id": data.get("channel_id", ""),
+                "guild_id": data.get("guild_id", ""),
+            }
+        elif api in ("post_group_files", "post_c2c_files"):
+            fields = {"file_info": f"fake-{self.fake.next_id()}", "ttl": 0}
+        elif api == "get_guild":
+            guild_id = data.get("guild_id", "")
+            fields = {
+                "id": guild_id,
+                "name": f"guild{guild_id}",
+                "icon": "",
+                "owner_id": "",
+                "member_count": 0,
+                "max_members": 0,
+            }
+        elif api == "get_channel":
+            channel_id = data.get("channel_id", "")
+            fields = {"id": channel_id, "name": f"channel{channel_id}", "owner_id": ""}
+        handler = getattr(Bot, api, None)
+        restype = get_type_hints(handler.func).get("return") if handler else None
+        if isinstance(restype, type) and issubclass(restype, BaseModel):
+            return restype.construct(**fields)
+        return None
+
+    @override
+    def fake_error(self, throttled: bool = False) -> Exception:
+        if throttled:
+            return RateLimitException(_response(429, "模拟限流"))
+        return ActionFailed(_response(500, "模拟失败"))
+
+
+register_fake(Platform.QQ, FakeQQBot)
@@ -1,8 +1,26 @@
 import abc
+import asyncio
+import time
+from contextlib import aclosing
 from dataclasses import dataclass
+from functools import partial
 from io import BytesIO
 from pathlib import Path
-from typing import Any, ClassVar, Generic, Literal, NoReturn, TypeVar, Union
+from string import Formatter
+from typing import (
+    Any,
+    AsyncIterable,
+    AsyncIterator,
+    ClassVar,
+    Collection,
+    Generic,
+    Iterable,
+    Iterator,
+    Literal,
+    NoReturn,
+    TypeVar,
+    Union,
+)
 
 from nonebot.adapters import Bot as BaseBot
 from nonebot.adapters import Event as BaseEvent
@@ -11,7 +29,21 @@ from nonebot.exception import FinishedException
 from nonebot.matcher import current_bot, current_event
 from typing_extensions import Self
 
-from .utils import NotSupportException, Platform, get_current_platform
+from .config import plugin_config
+from .event import AnyMsgEvent
+from .models import Target
+from .utils import (
+    NotSupportException,
+    Platform,
+    gather_bounded,
+    get_current_platform,
+    get_platform_bot,
+    get_platform_bot_cls,
+)
+from .outbound import Priority, outbound
+from .utils import metrics
+from .utils.deadline import deadline, with_deadline
+from .utils.media import SpooledMedia, media_spool
 
 
 @dataclass(slots=True)
@@ -25,6 +57,114 @@ class AnyMsgSeg:
 
     type: Literal["text", "image", "at", "voice"]
     data: Any
+    media: SpooledMedia | None = None
+    "由插件管理的媒体文件，此时 data 为其路径"
+    temp: bool = False
+    "二进制数据为临时媒体，构建时写入临时媒体目录，发送完成后删除"
+
+
+@dataclass(slots=True, frozen=True)
+class NativeMedia:
+    """
+    说明：
+
+        已在平台侧就绪的媒体，如 KOOK 上传后得到的 file_key、OneBot 收到的图片文件名
+
+        发送到同一平台时直接使用 ``ref``，发送到其他平台时使用 ``url``
+
+    """
+
+    platform: Platform
+    ref: Any
+    url: str | None = None
+    "平台外可访问的网址，为空则不能发送到其他平台"
+
+
+def merge_text(msg: Iterable[AnyMsgSeg]) -> Iterator[AnyMsgSeg]:
+    """
+    说明：
+
+        合并相邻的文本消息段，每段文本只拼接一次
+
+    参数:
+
+        * ``msg``: 消息段
+
+    """
+    texts: list[str] = []
+    for seg in msg:
+        if seg.type == "text":
+            texts.append(seg.data)
+            continue
+        if texts:
+            yield AnyMsgSeg("text", "".join(texts))
+            texts.clear()
+        yield seg
+    if texts:
+        yield AnyMsgSeg("text", "".join(texts))
+
+
+_SENTENCE_ENDS = "。！？；.!?;"
+
+
+def _cut_text(text: str, limit: int, strict: bool) -> int:
+    # 依次尝试在换行、句末、空白处截断，strict 为 False 时最后按字符截断
+    head = text[:limit]
+    if (i := head.rfind("\n")) > 0:
+        return i + 1
+    if (i := max(head.rfind(c) for c in _SENTENCE_ENDS)) > 0:
+        return i + 1
+    if (i := max(head.rfind(" "), head.rfind("\t"))) > 0:
+        return i + 1
+    return 0 if strict else limit
+
+
+def split_message(
+    msg: Iterable[AnyMsgSeg],
+    max_length: int | None,
+    max_media: int | None,
+    media_types: Collection[str] = ("image", "voice"),
+) -> list[list[AnyMsgSeg]]:
+    """
+    说明：
+
+        按单条消息的文本长度与媒体数量限制划分消息
+
+        文本优先在换行、句末、空白处截断，找不到时按字符截断
+
+    参数:
+
+        * ``msg``: 消息段
+        * ``max_length``: 单条消息的最大文本长度，为 None 则不限制
+        * ``max_media``: 单条消息的最大媒体数量，为 None 则不限制
+        * ``media_types``: 计入媒体数量的消息段类型. 默认为图片与语音.
+
+    """
+    parts: list[list[AnyMsgSeg]] = [[]]
+    length = media = 0
+    for seg in merge_text(msg):
+        if seg.type == "text" and max_length:
+            text: str = seg.data
+            while text:
+                room = max_length - length
+                if len(text) <= room:
+                    parts[-1].append(AnyMsgSeg("text", text))
+                    length += len(text)
+                    break
+                # 当前消息已有内容且找不到合适的截断点时，另起一条
+                if room > 0 and (cut := _cut_text(text, room, bool(parts[-1]))):
+                    parts[-1].append(AnyMsgSeg("text", text[:cut]))
+                    text = text[cut:]
+                parts.append([])
+                length = media = 0
+            continue
+        if seg.type in media_types and max_media:
+            if media >= max_media:
+                parts.append([])
+                length = media = 0
+            media += 1
+        parts[-1].append(seg)
+    return [part for part in parts if part]
 
 
 TB = TypeVar("TB", bound=BaseBot)
@@ -42,21 +182,199 @@ class AnyMsgHandler(abc.ABC, Generic[TB, TE, TM]):
 
     _adapter_map: ClassVar[dict[Platform, type["AnyMsgHandler"]]] = {}
     platform: Platform
+    max_length: ClassVar[int | None] = None
+    "单条消息的最大文本长度，为 None 则不限制"
+    max_media: ClassVar[int | None] = None
+    "单条消息的最大媒体数量，为 None 则不限制"
+    media_types: ClassVar[frozenset[str]] = frozenset(("image", "voice"))
+    "计入 `max_media` 的消息段类型，即 `assemble` 中实际作为媒体发送的类型"
+    editable: ClassVar[bool] = False
+    "是否支持修改已发送的文本消息，为 True 时须实现 `edit`"
 
     def __init_subclass__(cls) -> None:
         if getattr(cls, "platform", None) is not None:
             cls._adapter_map[cls.platform] = cls
         return super().__init_subclass__()
-    
+
     @classmethod
     def get_handler(cls, platform: Platform) -> type["AnyMsgHandler"]:
         return cls._adapter_map[platform]
 
+    @classmethod
+    async def prepare(cls, seg: AnyMsgSeg, bot: TB | None = None) -> AnyMsgSeg:
+        """
+        说明：
+
+            准备单个媒体消息段（下载、上传、编码等），默认原样返回
+
+            各平台如需上传媒体，重写此方法并返回 `NativeMedia` 数据的消息段
+
+        参数:
+
+            * ``seg``: 图片或语音消息段
+            * ``bot``: 发送所使用的 Bot，需要上传时应通过该 Bot 上传，为 None 时自行选择
+
+        """
+        return seg
+
+    @classmethod
+    def _needs_prepare(cls, seg: AnyMsgSeg) -> bool:
+        return seg.type in ("image", "voice") and not (
+            isinstance(seg.data, NativeMedia) and seg.data.platform == cls.platform
+        )
+
+    @classmethod
+    async def _prepare(cls, seg: AnyMsgSeg, bot: TB | None = None) -> AnyMsgSeg:
+        if isinstance(seg.data, NativeMedia):
+            # 其他平台的媒体，按网址处理
+            if seg.data.url is None:
+                raise NotSupportException(
+                    f"{seg.data.platform.name} 的媒体不能发送到其他平台"
+                )
+            seg = AnyMsgSeg(seg.type, seg.data.url)
+        with metrics.prepare.time(cls.platform.name, seg.type):
+            return await with_deadline(cls.prepare(seg, bot), "prepare")
+
+    @classmethod
+    async def prepare_all(
+        cls, msg: list[AnyMsgSeg], bot: TB | None = None
+    ) -> list[AnyMsgSeg]:
+        """
+        说明：
+
+            并发准备所有媒体消息段，保持消息段顺序
+
+            并发数受 `any_media_concurrency` 限制，任一失败时取消其余准备并抛出异常
+
+        参数:
+
+            * ``msg``: 消息段列表
+            * ``bot``: 发送所使用的 Bot，见 `prepare`
+
+        """
+        index = [i for i, seg in enumerate(msg) if cls._needs_prepare(seg)]
+        if not index:
+            return msg
+        prepared = await gather_bounded(
+            (partial(cls._prepare, msg[i], bot) for i in index),
+            plugin_config.any_media_concurrency,
+        )
+        result = list(msg)
+        for i, seg in zip(index, prepared):
+            result[i] = seg
+        return result
+
+    @classmethod
+    def partition(cls, msg: list[AnyMsgSeg]) -> list[list[AnyMsgSeg]]:
+        """
+        说明：
+
+            将消息段划分为多条消息，默认按 `max_length` 与 `max_media` 划分
+
+        参数:
+
+            * ``msg``: 消息段列表
+
+        """
+        return split_message(msg, cls.max_length, cls.max_media, cls.media_types)
+
     @classmethod
     @abc.abstractmethod
-    async def build(cls, msg: list[AnyMsgSeg]) -> list[TM]:
+    def assemble(cls, msg: list[AnyMsgSeg]) -> TM:
+        """
+        说明：
+
+            将已准备好的消息段组装为一条平台消息
+
+        参数:
+
+            * ``msg``: 消息段列表
+
+        """
         raise NotImplementedError
 
+    @classmethod
+    def parse(cls, msg: TM) -> list[AnyMsgSeg]:
+        """
+        说明：
+
+            将平台消息解析为消息段，平台侧已有的媒体解析为 `NativeMedia`，无法表示的消息段被忽略
+
+        参数:
+
+            * ``msg``: 平台消息
+
+        """
+        raise NotSupportException("该平台不支持解析消息")
+
+    @classmethod
+    async def build(cls, msg: list[AnyMsgSeg], bot: TB | None = None) -> list[TM]:
+        """
+        说明：
+
+            构建平台消息
+
+        参数:
+
+            * ``msg``: 消息段列表
+            * ``bot``: 发送所使用的 Bot，见 `prepare`
+
+        """
+        with metrics.build.time(cls.platform.name):
+            msg = await cls.prepare_all(msg, bot)
+            return [cls.assemble(part) for part in cls.partition(msg)]
+
+    @classmethod
+    async def iter_build(
+        cls, msg: list[AnyMsgSeg], bot: TB | None = None
+    ) -> AsyncIterator[TM]:
+        """
+        说明：
+
+            流水线构建平台消息，按顺序逐条产出
+
+            先划分消息，再并发准备所有媒体（靠前的优先），每条消息的媒体准备好后立即产出，无需等待后续消息
+
+            任一准备失败时取消其余准备并抛出异常，已产出的消息不受影响
+
+        参数:
+
+            * ``msg``: 消息段列表
+            * ``bot``: 发送所使用的 Bot，见 `prepare`
+
+        """
+        start = time.perf_counter()
+        semaphore = asyncio.Semaphore(max(plugin_config.any_media_concurrency, 1))
+
+        async def prepare(seg: AnyMsgSeg) -> AnyMsgSeg:
+            async with semaphore:
+                return await cls._prepare(seg, bot)
+
+        # 划分只依赖消息段类型与文本，可在媒体准备前进行
+        parts = [
+            [
+                asyncio.ensure_future(prepare(seg)) if cls._needs_prepare(seg) else seg
+                for seg in part
+            ]
+            for part in cls.partition(msg)
+        ]
+        tasks = [
+            item for part in parts for item in part if isinstance(item, asyncio.Future)
+        ]
+        try:
+            for part in parts:
+                yield cls.assemble(
+                    [
+                        await item if isinstance(item, asyncio.Future) else item
+                        for item in part
+                    ]
+                )
+        finally:
+            for task in tasks:
+                task.cancel()
+            await asyncio.gather(*tasks, return_exceptions=True)
+            metrics.build.observe(time.perf_counter() - start, cls.platform.name)
+
     @classmethod
     @abc.abstractmethod
     async def send(
@@ -69,6 +387,307 @@ class AnyMsgHandler(abc.ABC, Generic[TB, TE, TM]):
     ) -> Any:
         raise NotImplementedError
 
+    @classmethod
+    async def send_to(cls, bot: TB, target: Target, msg: TM) -> Any:
+        """
+        说明：
+
+            不依赖事件，主动向目标发送消息
+
+        参数:
+
+            * ``bot``: Bot 对象
+            * ``target``: 发送目标
+            * ``msg``: 平台消息
+
+        """
+        raise NotSupportException("该平台不支持主动发送消息")
+
+    @classmethod
+    def assemble_editable(cls, text: str) -> TM:
+        """
+        说明：
+
+            将文本组装为之后可被 `edit` 修改的平台消息，默认与 `assemble` 一致
+
+        参数:
+
+            * ``text``: 文本
+
+        """
+        return cls.assemble([AnyMsgSeg("text", text)])
+
+    @classmethod
+    async def edit(
+        cls, bot: TB, event: TE, sent: Any, text: str, at: bool = False
+    ) -> Any:
+        """
+        说明：
+
+            将已发送的消息修改为新的文本
+
+        参数:
+
+            * ``bot``: Bot 对象
+            * ``event``: 事件
+            * ``sent``: 发送该消息时 `send` 的返回值
+            * ``text``: 新的文本
+            * ``at``: 发送时是否艾特了事件主体
+
+        """
+        raise NotSupportException("该平台不支持修改消息")
+
+
+@dataclass(slots=True)
+class BroadcastResult:
+    "广播中单个目标的发送结果"
+    target: Target
+    result: Any = None
+    exception: BaseException | None = None
+
+    @property
+    def ok(self) -> bool:
+        return self.exception is None
+
+
+def _media_seg(
+    type: Literal["image", "voice"],
+    data: str | Path | bytes | BytesIO,
+    is_temp: bool,
+) -> AnyMsgSeg:
+    # 临时文件交由临时媒体池管理；二进制数据在构建时才写入，见 `_spill`
+    if isinstance(data, Path) and is_temp:
+        media = media_spool.adopt(data)
+        return AnyMsgSeg(type, media.path, media)
+    return AnyMsgSeg(type, data, temp=is_temp and not isinstance(data, (str, Path)))
+
+
+def _should_spill(seg: AnyMsgSeg) -> bool:
+    data = seg.data
+    if seg.media is not None or not isinstance(data, (bytes, BytesIO)):
+        return False
+    size = len(data) if isinstance(data, bytes) else data.getbuffer().nbytes
+    return seg.temp or size > plugin_config.any_media_spool_threshold
+
+
+_spilling: dict[int, "asyncio.Future[None]"] = {}
+
+
+async def _spill_seg(seg: AnyMsgSeg) -> None:
+    # 消息段可能被多条消息共享，原地替换为落盘后的文件，同一消息段只写入一次
+    if (task := _spilling.get(id(seg))) is None:
+
+        async def spill() -> None:
+            try:
+                if media := await media_spool.write(seg.data, temp=seg.temp):
+                    seg.data, seg.media = media.path, media
+            finally:
+                del _spilling[id(seg)]
+
+        task = _spilling[id(seg)] = asyncio.ensure_future(spill())
+    await asyncio.shield(task)
+
+
+async def _spill(segs: list[AnyMsgSeg]) -> list[AnyMsgSeg]:
+    """
+    说明：
+
+        将临时的与超过 `any_media_spool_threshold` 的二进制媒体写入临时媒体目录，不再占用内存
+
+        摘要计算与写入在媒体线程池中进行，不阻塞事件循环；超出配额时保留在内存中
+
+    参数:
+
+        * ``segs``: 消息段列表，原地修改
+
+    """
+    if spills := [seg for seg in segs if _should_spill(seg)]:
+        await with_deadline(
+            asyncio.gather(*(_spill_seg(seg) for seg in spills)), "prepare"
+        )
+    return segs
+
+
+async def _send_msgs(
+    bot: BaseBot, msgs: list[BaseMsg], at: bool, reply: bool, priority: Priority
+):
+    event: Any = current_event.get()
+    handler = AnyMsgHandler.get_handler(get_current_platform(bot))
+    await outbound.submit(handler, bot, event, msgs, at, reply, priority)
+
+
+async def _send_pipelined(
+    bot: BaseBot, msg: list[AnyMsgSeg], at: bool, reply: bool, priority: Priority
+):
+    event: Any = current_event.get()
+    handler = AnyMsgHandler.get_handler(get_current_platform(bot))
+    async with aclosing(handler.iter_build(msg, bot)) as parts:
+        async for part in parts:
+            # 等待上一条送达后再提交下一条，后续媒体的准备在此期间继续进行
+            await outbound.submit(handler, bot, event, [part], at, reply, priority)
+            at = False
+
+
+class _MsgStream:
+    """
+    说明：
+
+        流式发送：按间隔合并新内容，支持修改消息的平台修改同一条消息，其他平台追加发送
+
+        API 调用次数取决于持续时间与间隔，而不是内容的块数
+
+    """
+
+    def __init__(
+        self,
+        bot: BaseBot,
+        at: bool,
+        reply: bool,
+        priority: Priority,
+    ) -> None:
+        self.bot = bot
+        self.event: Any = current_event.get()
+        self.handler = AnyMsgHandler.get_handler(get_current_platform(bot))
+        self.at = at
+        self.reply = reply
+        self.priority = priority
+        self.pending: list[AnyMsgSeg] = []
+        "尚未发送的消息段"
+        self._text = ""
+        self._sent: Any = None
+        self._sent_at = False
+
+    async def _submit(self, msgs: list[BaseMsg], coalesce: bool = True) -> list[Any]:
+        results = await outbound.submit(
+            self.handler,
+            self.bot,
+            self.event,
+            msgs,
+            self.at,
+            self.reply,
+            self.priority,
+            coalesce,
+        )
+        self.at = self.reply = False
+        return results
+
+    async def _append(self, segs: list[AnyMsgSeg]) -> None:
+        # 从新的一条消息开始修改，过长时按平台限制划分
+        handler = self.handler
+        for part in handler.partition(segs):
+            self._text = "".join(seg.data for seg in part)
+            self._sent_at = self.at
+            results = await self._submit(
+                [handler.assemble_editable(self._text)], coalesce=False
+            )
+            self._sent = results[-1]
+
+    async def flush(self) -> None:
+        "发送或合并尚未发送的内容"
+        segs, self.pending = self.pending, []
+        handler = self.handler
+        if not handler.editable or any(seg.type != "text" for seg in segs):
+            # 媒体无法修改进已发送的消息，之后的文本从新的一条消息开始
+            self._sent = None
+            await self._submit(await handler.build(segs, self.bot))
+            return
+        text = self._text + "".join(seg.data for seg in segs)
+        limit = handler.max_length
+        if self._sent is None or (limit and len(text) > limit):
+            await self._append(segs)
+            return
+        await outbound.throttle(handler.platform, self.priority)
+        await handler.edit(self.bot, self.event, self._sent, text, self._sent_at)
+        self._text = text
+
+    async def run(self, chunks: AsyncIterable["str | AnyMsg"], interval: float):
+        loop = asyncio.get_running_loop()
+        ready = asyncio.Event()
+        done = asyncio.Event()
+        medias: list[SpooledMedia] = []
+        if self.pending:
+            ready.set()
+
+        async def read() -> None:
+            try:
+                async for chunk in chunks:
+                    if isinstance(chunk, str):
+                        self.pending.append(AnyMsgSeg("text", chunk))
+                    else:
+                        segs = await _spill(chunk._msg)
+                        new = [seg.media for seg in segs if seg.media]
+                        media_spool.pin(*new)
+                        medias.extend(new)
+                        self.pending.extend(segs)
+                    ready.set()
+            finally:
+                done.set()
+                ready.set()
+
+        reader = asyncio.create_task(read())
+        try:
+            next_flush = loop.time()
+            while True:
+                await ready.wait()
+                if (delay := next_flush - loop.time()) > 0:
+                    await asyncio.sleep(delay)
+                ready.clear()
+                if self.pending:
+                    next_flush = loop.time() + interval
+                    await self.flush()
+                if done.is_set() and not self.pending:
+                    break
+            await reader
+        finally:
+            reader.cancel()
+            media_spool.release(*medias)
+
+
+class _Rope:
+    """
+    说明：
+
+        不可变的消息段绳，用于在消息之间共享消息段
+
+        拼接为 O(1)，首次展开后缓存为叶子节点
+
+    """
+
+    __slots__ = ("left", "right", "segs")
+
+    def __init__(
+        self,
+        segs: tuple[AnyMsgSeg, ...] | None = None,
+        left: "_Rope | None" = None,
+        right: "_Rope | None" = None,
+    ) -> None:
+        self.segs = segs
+        self.left = left
+        self.right = right
+
+    @classmethod
+    def concat(cls, left: "_Rope | None", right: "_Rope | None") -> "_Rope | None":
+        if left is None:
+            return right
+        if right is None:
+            return left
+        return cls(left=left, right=right)
+
+    def flatten(self) -> tuple[AnyMsgSeg, ...]:
+        if self.segs is None:
+            result: list[AnyMsgSeg] = []
+            stack: list[_Rope] = [self]
+            while stack:
+                node = stack.pop()
+                if node.segs is not None:
+                    result.extend(node.segs)
+                else:
+                    stack.append(node.right)  # type: ignore
+                    stack.append(node.left)  # type: ignore
+            self.segs = tuple(result)
+            self.left = self.right = None
+        return self.segs
+
 
 class AnyMsg:
     """
@@ -81,16 +700,47 @@ class AnyMsg:
     def __init__(
         self, msg: Union[str, list[AnyMsgSeg], AnyMsgSeg, "AnyMsg", None] = None
     ) -> None:
-        self._msg: list[AnyMsgSeg] = []
+        self._root: _Rope | None = None
+        "与其他消息共享的不可变部分"
+        self._segs: list[AnyMsgSeg] = []
+        "本消息独占的末尾消息段"
+        self._text: list[str] = []
+        "末尾尚未合并的文本块"
         if msg:
             if isinstance(msg, str):
                 self.text(msg)
             elif isinstance(msg, list):
-                self._msg.extend(msg)
+                self._segs.extend(msg)
             elif isinstance(msg, AnyMsgSeg):
-                self._msg.append(msg)
+                self._segs.append(msg)
             else:
-                self._msg.extend(msg._msg)
+                self._root = msg._freeze()
+
+    @property
+    def _msg(self) -> list[AnyMsgSeg]:
+        "消息段列表"
+        self._flush_text()
+        if self._root is None:
+            return list(self._segs)
+        return [*self._root.flatten(), *self._segs]
+
+    def _flush_text(self) -> None:
+        # 每块文本只拼接一次；与之前的文本消息段相邻时不再合并，构建时由 merge_text 合并
+        if self._text:
+            self._segs.append(AnyMsgSeg("text", "".join(self._text)))
+            self._text.clear()
+
+    def _append(self, seg: AnyMsgSeg) -> None:
+        self._flush_text()
+        self._segs.append(seg)
+
+    def _freeze(self) -> _Rope | None:
+        "将独占部分并入共享部分，之后本消息的全部消息段均可被共享"
+        self._flush_text()
+        if self._segs:
+            self._root = _Rope.concat(self._root, _Rope(tuple(self._segs)))
+            self._segs = []
+        return self._root
 
     def __add__(self, other: str | Self) -> Self:
         result = self.copy()
@@ -105,7 +755,7 @@ class AnyMsg:
         if isinstance(other, str):
             return self.text(other)
         elif isinstance(other, AnyMsg):
-            self._msg.extend(other._msg)
+            self._root = _Rope.concat(self._freeze(), other._freeze())
             return self
         else:
             raise NotSupportException("不支持的操作")
@@ -119,6 +769,50 @@ class AnyMsg:
         """
         return AnyMsg(self)
 
+    @classmethod
+    def from_message(cls, platform: Platform, msg: BaseMsg) -> "AnyMsg":
+        """
+        说明：
+
+            从平台消息生成消息，平台侧已有的媒体（如 KOOK 的 file_key、OneBot 的图片文件名）保留原引用，
+            发送到同一平台时不再下载、上传
+
+            无法表示的消息段（如表情、卡片）被忽略
+
+        参数:
+
+            * ``platform``: 平台
+            * ``msg``: 平台消息
+
+        """
+        return cls(AnyMsgHandler.get_handler(platform).parse(msg))
+
+    @classmethod
+    def from_event(cls, event: AnyMsgEvent | BaseEvent) -> "AnyMsg":
+        """
+        说明：
+
+            从消息事件的用户消息生成消息，用于转发、复读等
+
+        参数:
+
+            * ``event``: `AnyMsgEvent` 或平台消息事件
+
+        用法:
+
+            ```python
+            @matcher.handle()
+            async def _(event: AnyGroupMsgEvent):
+                await AnyMsg.from_event(event).send()
+            ```
+
+        """
+        if not isinstance(event, AnyMsgEvent):
+            if (any_event := AnyMsgEvent.solve(event)) is None:
+                raise NotSupportException("不是消息事件")
+            event = any_event
+        return cls.from_message(event.platform, event.message)
+
     def image(self, img: str | Path | bytes | BytesIO, is_temp: bool = False) -> Self:
         """
         说明：
@@ -132,12 +826,14 @@ class AnyMsg:
                 - `网址`: str
                 - `路径`: Path
                 - `二进制数据`: bytes | BytesIO
-            * ``is_temp``: 是否为缓存文件，当 img 为文件名时才有效
+            * ``is_temp``: 是否为临时文件，为 True 时将在发送完成后删除
+                - `文件名`/`路径`: 发送完成后删除该文件
+                - `二进制数据`: 构建时写入临时媒体目录，不再占用内存
 
         """
         if isinstance(img, str) and not img.startswith("http"):
             img = Path(img)
-        self._msg.append(AnyMsgSeg("image", img))
+        self._append(_media_seg("image", img, is_temp))
         return self
 
     def voice(self, voice: str | Path | bytes | BytesIO, is_temp: bool = False) -> Self:
@@ -153,12 +849,14 @@ class AnyMsg:
                 - `网址`: str
                 - `路径`: Path
                 - `二进制数据`: bytes | BytesIO
-            * ``is_temp``: 是否为缓存文件，当 img 为文件名时才有效
+            * ``is_temp``: 是否为临时文件，为 True 时将在发送完成后删除
+                - `文件名`/`路径`: 发送完成后删除该文件
+                - `二进制数据`: 构建时写入临时媒体目录，不再占用内存
 
         """
         if isinstance(voice, str) and not voice.startswith("http"):
             voice = Path(voice)
-        self._msg.append(AnyMsgSeg("voice", voice))
+        self._append(_media_seg("voice", voice, is_temp))
         return self
 
     def text(self, text: str) -> Self:
@@ -172,10 +870,7 @@ class AnyMsg:
             * ``text``: 文本
 
         """
-        if self._msg and self._msg[-1].type == "text":
-            self._msg[-1].data += text
-        else:
-            self._msg.append(AnyMsgSeg("text", text))
+        self._text.append(text)
         return self
 
     def at(self, user_id: str) -> Self:
@@ -189,11 +884,14 @@ class AnyMsg:
             * ``user_id``: 用户 id
 
         """
-        self._msg.append(AnyMsgSeg("at", user_id))
+        self._append(AnyMsgSeg("at", user_id))
         return self
 
     async def build(
-        self, platform: Platform | None = None, bot: BaseBot | None = None
+        self,
+        platform: Platform | None = None,
+        bot: BaseBot | None = None,
+        timeout: float | None = None,
     ) -> list[BaseMsg]:
         """
         说明：
@@ -204,14 +902,27 @@ class AnyMsg:
 
             * ``platform``: 平台
             * ``bot``: 所使用的 Bot 对象
+            * ``timeout``: 超时时间，单位: 秒，超时抛出 `DeadlineExceeded`. 默认不超时.
 
         """
         if platform is None:
             platform = get_current_platform(bot)
-        return await AnyMsgHandler.get_handler(platform).build(self._msg)
+        handler = AnyMsgHandler.get_handler(platform)
+        if not isinstance(bot, get_platform_bot_cls(platform)):
+            bot = None
+        with deadline(timeout):
+            segs = await _spill(self._msg)
+            return await handler.build(segs, bot)
 
     async def send(
-        self, *, bot: BaseBot | None = None, at: bool = False, reply: bool = False
+        self,
+        *,
+        bot: BaseBot | None = None,
+        at: bool = False,
+        reply: bool = False,
+        priority: Priority = Priority.NORMAL,
+        pipeline: bool = False,
+        timeout: float | None = None,
     ):
         """
         说明：
@@ -223,17 +934,160 @@ class AnyMsg:
             * ``bot``：指定 Bot，默认为 False
             * ``at``: 是否艾特事件主体. 默认为 False.
             * ``reply``: 是否回复消息. 默认为 False.
+            * ``priority``: 发送优先级. 默认为 Priority.NORMAL.
+            * ``pipeline``: 是否流水线发送：消息被分为多条时，每条构建完成即发送，不等待后续消息的媒体准备. 默认为 False.
+            * ``timeout``: 超时时间，单位: 秒，覆盖构建、排队与平台 API 调用，超时取消未完成的工作并抛出 `DeadlineExceeded`. 默认不超时.
 
         """
         bot = bot or current_bot.get()
-        event: Any = current_event.get()
-        msgs = await self.build(bot=bot)
-        platform = get_current_platform(bot)
-        for msg in msgs:
-            await AnyMsgHandler.get_handler(platform).send(bot, event, msg, at, reply)
-            at = False
+        with deadline(timeout):
+            segs = await _spill(self._msg)
+            medias = [seg.media for seg in segs if seg.media]
+            media_spool.pin(*medias)
+            try:
+                if pipeline:
+                    await _send_pipelined(bot, segs, at, reply, priority)
+                else:
+                    handler = AnyMsgHandler.get_handler(get_current_platform(bot))
+                    msgs = await handler.build(segs, bot)
+                    await _send_msgs(bot, msgs, at, reply, priority)
+            finally:
+                media_spool.release(*medias)
+
+    async def send_stream(
+        self,
+        chunks: AsyncIterable["str | AnyMsg"],
+        *,
+        bot: BaseBot | None = None,
+        at: bool = False,
+        reply: bool = False,
+        priority: Priority = Priority.NORMAL,
+        interval: float | None = None,
+    ):
+        """
+        说明：
+
+            流式发送消息，适用于进度输出、逐步生成的文本等
+
+            先立即发送本消息（为空则为第一块内容），之后每隔 ``interval`` 秒将期间产出的内容合并发送一次：
+            支持修改消息的平台（如 KOOK）修改同一条消息，超出长度限制或遇到媒体时另起一条；其他平台追加发送新消息
 
-    async def finish(self, at: bool = False, reply: bool = False) -> NoReturn:
+            内容结束后发送剩余部分；迭代中抛出的异常在已产出的内容发送后抛出
+
+        参数:
+
+            * ``chunks``: 依次追加的内容，文本或 `AnyMsg`
+            * ``bot``：指定 Bot，默认为当前 Bot
+            * ``at``: 是否艾特事件主体，仅作用于第一条消息. 默认为 False.
+            * ``reply``: 是否回复消息，仅作用于第一条消息. 默认为 False.
+            * ``priority``: 发送优先级. 默认为 Priority.NORMAL.
+            * ``interval``: 两次更新之间的最小间隔，单位: 秒. 默认为 `any_stream_interval`.
+
+        用法:
+
+            ```python
+            async def progress():
+                for i in range(100):
+                    await asyncio.sleep(0.1)
+                    yield f"{i}% "
+
+            await AnyMsg("进度: ").send_stream(progress())
+            ```
+
+        """
+        if interval is None:
+            interval = plugin_config.any_stream_interval
+        stream = _MsgStream(bot or current_bot.get(), at, reply, priority)
+        stream.pending = await _spill(self._msg)
+        medias = [seg.media for seg in stream.pending if seg.media]
+        media_spool.pin(*medias)
+        try:
+            await stream.run(chunks, interval)
+        finally:
+            media_spool.release(*medias)
+
+    async def broadcast(
+        self,
+        targets: Iterable[Target],
+        *,
+        concurrency: int = 5,
+        priority: Priority = Priority.LOW,
+    ) -> list[BroadcastResult]:
+        """
+        说明：
+
+            向多个平台的多个目标广播消息
+
+            每个平台只构建一次（媒体只上传一次），每个 Bot 的并发发送数受 ``concurrency`` 限制
+
+            单个目标或平台失败不会中止广播，结果按 ``targets`` 的顺序返回
+
+        参数:
+
+            * ``targets``: 发送目标
+            * ``concurrency``: 每个 Bot 的最大并发发送数
+            * ``priority``: 发送优先级. 默认为 Priority.LOW.
+
+        """
+        results = [BroadcastResult(target) for target in targets]
+        by_platform: dict[Platform, list[BroadcastResult]] = {}
+        for result in results:
+            by_platform.setdefault(result.target.platform, []).append(result)
+        segs = await _spill(self._msg)
+        medias = [seg.media for seg in segs if seg.media]
+        semaphores: dict[str, asyncio.Semaphore] = {}
+
+        async def send_one(
+            handler: type[AnyMsgHandler], msgs: list[BaseMsg], result: BroadcastResult
+        ) -> None:
+            target = result.target
+            try:
+                bot = get_platform_bot(target.platform, target.bot_id)
+                semaphore = semaphores.setdefault(
+                    bot.self_id, asyncio.Semaphore(concurrency)
+                )
+                async with semaphore:
+                    result.result = await outbound.submit_to(
+                        handler, bot, target, msgs, priority
+                    )
+            except Exception as e:
+                result.exception = e
+
+        async def send_platform(
+            platform: Platform, platform_results: list[BroadcastResult]
+        ) -> None:
+            # 所有目标指定同一 Bot 时由该 Bot 上传媒体
+            bot_ids = {result.target.bot_id for result in platform_results}
+            try:
+                handler = AnyMsgHandler.get_handler(platform)
+                bot_id = bot_ids.pop() if len(bot_ids) == 1 else None
+                bot = None if bot_id is None else get_platform_bot(platform, bot_id)
+                msgs = await handler.build(segs, bot)
+            except Exception as e:
+                for result in platform_results:
+                    result.exception = e
+                return
+            await asyncio.gather(
+                *(send_one(handler, msgs, result) for result in platform_results)
+            )
+
+        media_spool.pin(*medias)
+        try:
+            await asyncio.gather(
+                *(send_platform(p, rs) for p, rs in by_platform.items())
+            )
+        finally:
+            media_spool.release(*medias)
+        return results
+
+    async def finish(
+        self,
+        at: bool = False,
+        reply: bool = False,
+        priority: Priority = Priority.NORMAL,
+        pipeline: bool = False,
+        timeout: float | None = None,
+    ) -> NoReturn:
         """
         说明：
 
@@ -243,7 +1097,129 @@ class AnyMsg:
 
             * ``at``: 是否艾特事件主体. 默认为 False.
             * ``reply``: 是否回复消息. 默认为 False.
+            * ``priority``: 发送优先级. 默认为 Priority.NORMAL.
+            * ``pipeline``: 是否流水线发送. 默认为 False.
+            * ``timeout``: 超时时间，单位: 秒. 默认不超时.
 
         """
-        await self.send(at=at, reply=reply)
+        await self.send(
+            at=at, reply=reply, priority=priority, pipeline=pipeline, timeout=timeout
+        )
         raise FinishedException
+
+
+@dataclass(slots=True, frozen=True)
+class _Slot:
+    type: Literal["text", "at"]
+    template: str
+
+
+class AnyMsgTemplate:
+    """
+    说明：
+
+        预编译的任意消息模板
+
+        文本中的 `{name}` 与 `at("{name}")` 为占位符，文本中的 `{{`、`}}` 表示花括号本身
+
+        每个平台首次渲染时编译一次：合并静态文本、提前上传或编码媒体，之后渲染只填充占位符
+
+    参数:
+
+        * ``msg``: 模板消息
+
+    """
+
+    def __init__(self, msg: str | AnyMsg) -> None:
+        self._segs = AnyMsg(msg)._msg
+        self._compiled: dict[Platform, list[AnyMsgSeg | _Slot]] = {}
+
+    async def compile(
+        self, platform: Platform | None = None, bot: BaseBot | None = None
+    ) -> None:
+        """
+        说明：
+
+            为平台编译模板，渲染时会自动编译
+
+        参数:
+
+            * ``platform``: 平台
+            * ``bot``: 所使用的 Bot 对象
+
+        """
+        if platform is None:
+            platform = get_current_platform(bot)
+        handler = AnyMsgHandler.get_handler(platform)
+        compiled: list[AnyMsgSeg | _Slot] = []
+        await _spill(self._segs)
+        if not isinstance(bot, get_platform_bot_cls(platform)):
+            bot = None
+        for seg in merge_text(await handler.prepare_all(self._segs, bot)):
+            if seg.type in ("text", "at") and isinstance(seg.data, str):
+                fields = [f for _, f, _, _ in Formatter().parse(seg.data) if f is not None]
+                if fields:
+                    compiled.append(_Slot(seg.type, seg.data))
+                else:
+                    compiled.append(AnyMsgSeg(seg.type, seg.data.format()))
+            else:
+                compiled.append(seg)
+        self._compiled[platform] = compiled
+
+    async def render(
+        self, platform: Platform | BaseBot | None = None, /, **values: Any
+    ) -> list[BaseMsg]:
+        """
+        说明：
+
+            填充占位符并生成平台消息
+
+        参数:
+
+            * ``platform``: 平台或所使用的 Bot 对象，默认为当前 Bot
+            * ``values``: 占位符的值
+
+        """
+        bot = None
+        if not isinstance(platform, Platform):
+            bot, platform = platform, get_current_platform(platform)
+        if platform in self._compiled:
+            metrics.cache.inc("template", "hit")
+        else:
+            metrics.cache.inc("template", "miss")
+            await self.compile(platform, bot)
+        handler = AnyMsgHandler.get_handler(platform)
+        segs = [
+            AnyMsgSeg(item.type, item.template.format_map(values))
+            if isinstance(item, _Slot)
+            else item
+            for item in self._compiled[platform]
+        ]
+        return [handler.assemble(part) for part in handler.partition(segs)]
+
+    async def send(
+        self,
+        *,
+        bot: BaseBot | None = None,
+        at: bool = False,
+        reply: bool = False,
+        priority: Priority = Priority.NORMAL,
+        **values: Any,
+    ):
+        """
+        说明：
+
+            渲染并发送消息
+
+        参数:
+
+            * ``bot``：指定 Bot，默认为当前 Bot
+            * ``at``: 是否艾特事件主体. 默认为 False.
+            * ``reply``: 是否回复消息. 默认为 False.
+            * ``priority``: 发送优先级. 默认为 Priority.NORMAL.
+            * ``values``: 占位符的值
+
+        """
+        bot = bot or current_bot.get()
+        msgs = await self.render(bot, **values)
+        await _send_msgs(bot, msgs, at, reply, priority)
@@ -1,4 +1,7 @@
 from dataclasses import dataclass
+from typing import Literal
+
+from .utils import Platform
 
 
 @dataclass(slots=True)
@@ -18,3 +21,19 @@ class Group:
     owner_id: str | None = None
     member_count: int | None = None
     max_members: int | None = None
+
+
+@dataclass(slots=True, frozen=True)
+class Target:
+    "发送目标"
+    platform: Platform
+    id: str
+    "群聊、子频道或用户 id"
+    type: Literal["group", "channel", "private"] = "group"
+    bot_id: str | None = None
+    "指定发送的 Bot，为空则自动选择"
+
+    @property
+    def rich_id(self) -> str:
+        "含平台名的目标 id"
+        return f"{self.platform.name}-{self.id}"
@@ -0,0 +1,458 @@
+import asyncio
+import time
+from collections import deque
+from dataclasses import dataclass, field
+from enum import IntEnum
+from typing import TYPE_CHECKING, Generic, TypeVar
+
+from nonebot.adapters import Bot as BaseBot
+from nonebot.adapters import Event as BaseEvent
+from nonebot.adapters import Message as BaseMsg
+from nonebot.matcher import current_matcher
+
+from .config import plugin_config
+from .event import AnyGroupEvent, AnyMsgEvent
+from .models import Target
+from .utils import Platform, metrics
+from .utils.deadline import DeadlineExceeded, get_deadline, with_deadline
+
+if TYPE_CHECKING:
+    from .message import AnyMsgHandler
+
+
+T = TypeVar("T")
+
+
+class Priority(IntEnum):
+    """
+    说明：
+
+        出站消息优先级，数值越小越优先
+
+    """
+
+    HIGH = 0
+    "交互回复"
+    NORMAL = 1
+    "默认"
+    LOW = 2
+    "批量通知、定时广播等"
+
+
+class LaneQueue(Generic[T]):
+    """
+    说明：
+
+        按优先级分道的队列
+
+        优先取出高优先级，等待越久的元素有效优先级越高（每等待 `any_outbound_aging` 秒提升一级），保证低优先级不会饿死
+
+    """
+
+    def __init__(self) -> None:
+        self._lanes: dict[Priority, deque[tuple[float, T]]] = {
+            priority: deque() for priority in Priority
+        }
+
+    def __len__(self) -> int:
+        return sum(len(lane) for lane in self._lanes.values())
+
+    def depth(self, priority: Priority) -> int:
+        "该优先级排队中的元素数"
+        return len(self._lanes[priority])
+
+    def push(self, item: T, priority: Priority) -> None:
+        self._lanes[priority].append((asyncio.get_running_loop().time(), item))
+
+    def next_lane(self) -> Priority | None:
+        "下一个应取出的优先级，队列为空时返回 None"
+        now = asyncio.get_running_loop().time()
+        aging = plugin_config.any_outbound_aging
+        best: tuple[float, float, Priority] | None = None
+        for priority, lane in self._lanes.items():
+            if lane:
+                since = lane[0][0]
+                score = priority - (now - since) / aging if aging > 0 else priority
+                if best is None or (score, since) < best[:2]:
+                    best = (score, since, priority)
+        return best and best[2]
+
+    def head(self, priority: Priority) -> T | None:
+        lane = self._lanes[priority]
+        return lane[0][1] if lane else None
+
+    def pop(self, priority: Priority) -> T:
+        return self._lanes[priority].popleft()[1]
+
+
+class TokenBucket:
+    """
+    说明：
+
+        按优先级分配令牌的令牌桶限速器
+
+    参数:
+
+        * ``rate``: 每秒补充的令牌数
+        * ``capacity``: 桶容量，即允许的突发数量
+
+    """
+
+    def __init__(self, rate: float, capacity: float) -> None:
+        self.rate = rate
+        self.capacity = max(capacity, 1)
+        self._tokens = self.capacity
+        self._updated = asyncio.get_running_loop().time()
+        self._waiters: LaneQueue[asyncio.Future[None]] = LaneQueue()
+        self._granter: asyncio.Task | None = None
+
+    def _refill(self) -> None:
+        now = asyncio.get_running_loop().time()
+        self._tokens = min(
+            self.capacity, self._tokens + (now - self._updated) * self.rate
+        )
+        self._updated = now
+
+    async def acquire(self, priority: Priority = Priority.NORMAL) -> None:
+        "取得一个令牌，不足时按优先级排队等待"
+        self._refill()
+        if self._tokens >= 1 and not self._waiters:
+            self._tokens -= 1
+            return
+        future = asyncio.get_running_loop().create_future()
+        self._waiters.push(future, priority)
+        if self._granter is None or self._granter.done():
+            self._granter = asyncio.create_task(self._grant())
+        await future
+
+    async def _grant(self) -> None:
+        while (lane := self._waiters.next_lane()) is not None:
+            self._refill()
+            if self._tokens < 1:
+                await asyncio.sleep((1 - self._tokens) / self.rate)
+                continue
+            future = self._waiters.pop(lane)
+            if not future.done():
+                self._tokens -= 1
+                future.set_result(None)
+
+
+@dataclass(slots=True)
+class LaneStats:
+    "单个优先级的出站统计"
+
+    depth: int = 0
+    "排队中的消息数"
+    sent: int = 0
+    "已开始发送的消息数"
+    wait_total: float = 0
+    "累计排队时间，单位: 秒"
+    wait_max: float = 0
+    "最长排队时间，单位: 秒"
+    expired: int = 0
+    "排队中超过截止时间而未发送的消息数"
+
+    @property
+    def wait_avg(self) -> float:
+        "平均排队时间，单位: 秒"
+        return self.wait_total / self.sent if self.sent else 0
+
+
+@dataclass(slots=True)
+class _Outgoing:
+    handler: type["AnyMsgHandler"]
+    bot: BaseBot
+    event: BaseEvent | None
+    msgs: list[BaseMsg]
+    at: bool
+    reply: bool
+    priority: Priority
+    target: Target | None = None
+    coalesce: bool = True
+    deadline: float | None = field(default_factory=get_deadline)
+    started: bool = False
+    submitted: float = field(default_factory=lambda: asyncio.get_running_loop().time())
+    future: asyncio.Future = field(
+        default_factory=lambda: asyncio.get_running_loop().create_future()
+    )
+
+    @property
+    def coalescable(self) -> bool:
+        "是否为可合并的短文本消息"
+        return (
+            self.coalesce
+            and not self.at
+            and not self.reply
+            and len(self.msgs) == 1
+            and all(seg.is_text() for seg in self.msgs[0])
+            and len(self.msgs[0].extract_plain_text())
+            <= plugin_config.any_outbound_coalesce_length
+        )
+
+
+def _mergeable(first: _Outgoing, item: _Outgoing) -> bool:
+    # 合并后的消息以第一条的 Bot、事件或目标发送
+    return (
+        item.coalescable
+        and item.handler is first.handler
+        and item.bot is first.bot
+        and item.target == first.target
+        and type(item.event) is type(first.event)
+        and item.deadline == first.deadline
+    )
+
+
+def target_key(bot: BaseBot, event: BaseEvent) -> str:
+    """
+    说明：
+
+        获取发送目标的队列键：群聊为 `channel_rich_id`，私聊为 `user_rich_id`
+
+        只使用事件响应器已解析的 `AnyEvent`，不为发送再次解析；未解析时为 Bot id 与会话 id
+
+    参数:
+
+        * ``bot``: Bot 对象
+        * ``event``: 事件
+
+    """
+    from .patch import ANYEVENT_TARGET
+
+    matcher = current_matcher.get(None)
+    any_event = matcher.state.get(ANYEVENT_TARGET) if matcher else None
+    if any_event is not None and any_event.event is event:
+        try:
+            if isinstance(any_event, AnyGroupEvent):
+                return any_event.channel_rich_id
+            if isinstance(any_event, AnyMsgEvent):
+                return any_event.user_rich_id
+        except KeyError:
+            pass
+    return f"{bot.self_id}-{event.get_session_id()}"
+
+
+class Outbound:
+    """
+    说明：
+
+        出站消息调度器
+
+        每个发送目标一个有序队列，每个平台一个令牌桶限速，可选合并短时间内的连续短文本消息
+
+        队列与令牌桶均按优先级分道，高优先级优先发送，低优先级不会饿死
+
+    """
+
+    def __init__(self) -> None:
+        self._queues: dict[str, LaneQueue[_Outgoing]] = {}
+        self._stats: dict[Priority, LaneStats] = {p: LaneStats() for p in Priority}
+        self._buckets: dict[Platform, TokenBucket | None] = {}
+        self._workers: set[asyncio.Task] = set()
+
+    def submit(
+        self,
+        handler: type["AnyMsgHandler"],
+        bot: BaseBot,
+        event: BaseEvent,
+        msgs: list[BaseMsg],
+        at: bool = False,
+        reply: bool = False,
+        priority: Priority = Priority.NORMAL,
+        coalesce: bool = True,
+    ) -> asyncio.Future:
+        """
+        说明：
+
+            提交待发送的平台消息，返回在消息送达后完成的 Future，其结果为各条消息的发送结果
+
+            继承当前的截止时间：排队中超时的消息不再发送，发送中超时的 API 调用被取消
+
+        参数:
+
+            * ``handler``: 平台消息处理器
+            * ``bot``: Bot 对象
+            * ``event``: 事件
+            * ``msgs``: 已构建的平台消息
+            * ``at``: 是否艾特事件主体
+            * ``reply``: 是否回复消息
+            * ``priority``: 优先级
+            * ``coalesce``: 是否允许与其他短文本消息合并，之后需修改的消息应为 False
+
+        """
+        item = _Outgoing(
+            handler, bot, event, msgs, at, reply, priority, coalesce=coalesce
+        )
+        return self._enqueue(target_key(bot, event), item)
+
+    def submit_to(
+        self,
+        handler: type["AnyMsgHandler"],
+        bot: BaseBot,
+        target: Target,
+        msgs: list[BaseMsg],
+        priority: Priority = Priority.NORMAL,
+    ) -> asyncio.Future:
+        """
+        说明：
+
+            提交主动发送给目标的平台消息，返回在消息送达后完成的 Future
+
+        参数:
+
+            * ``handler``: 平台消息处理器
+            * ``bot``: Bot 对象
+            * ``target``: 发送目标
+            * ``msgs``: 已构建的平台消息
+            * ``priority``: 优先级
+
+        """
+        item = _Outgoing(handler, bot, None, msgs, False, False, priority, target)
+        return self._enqueue(target.rich_id, item)
+
+    def _enqueue(self, key: str, item: _Outgoing) -> asyncio.Future:
+        priority = item.priority
+        if (queue := self._queues.get(key)) is None:
+            queue = self._queues[key] = LaneQueue()
+            self._workers.add(asyncio.create_task(self._worker(key, queue)))
+        queue.push(item, priority)
+        self._stats[priority].depth += 1
+        if item.deadline is not None:
+            asyncio.get_running_loop().call_at(item.deadline, self._expire, item)
+        return item.future
+
+    def _expire(self, item: _Outgoing) -> None:
+        if not item.started and not item.future.done():
+            item.future.set_exception(DeadlineExceeded("queue"))
+
+    def stats(self) -> dict[Priority, LaneStats]:
+        """
+        说明：
+
+            获取各优先级的排队深度与排队时间统计
+
+        """
+        return self._stats
+
+    async def throttle(
+        self, platform: Platform, priority: Priority = Priority.NORMAL
+    ) -> None:
+        """
+        说明：
+
+            等待平台令牌桶的一次发送配额，用于不经发送队列的 API 调用，如修改消息
+
+        参数:
+
+            * ``platform``: 平台
+            * ``priority``: 优先级
+
+        """
+        if bucket := self._get_bucket(platform):
+            await bucket.acquire(priority)
+
+    def _get_bucket(self, platform: Platform) -> TokenBucket | None:
+        if platform not in self._buckets:
+            rate = plugin_config.any_outbound_rate.get(platform.name)
+            self._buckets[platform] = (
+                TokenBucket(rate, plugin_config.any_outbound_burst) if rate else None
+            )
+        return self._buckets[platform]
+
+    async def _worker(self, key: str, queue: LaneQueue[_Outgoing]) -> None:
+        try:
+            while (lane := queue.next_lane()) is not None:
+                items = [queue.pop(lane)]
+                window = plugin_config.any_outbound_coalesce_window
+                if window > 0 and items[0].coalescable:
+                    await asyncio.sleep(window)
+                    limit = items[0].handler.max_length
+                    length = len(items[0].msgs[0].extract_plain_text())
+                    while (head := queue.head(lane)) and _mergeable(items[0], head):
+                        length += len(head.msgs[0].extract_plain_text()) + 1
+                        if limit and length > limit:
+                            break
+                        items.append(queue.pop(lane))
+                await self._deliver(items)
+        finally:
+            del self._queues[key]
+            self._workers.discard(asyncio.current_task())  # type: ignore
+
+    async def _deliver(self, items: list[_Outgoing]) -> None:
+        if expired := [item for item in items if item.future.done()]:
+            self._record(expired, expired=True)
+            items = [item for item in items if not item.future.done()]
+            if not items:
+                return
+        first = items[0]
+        handler = first.handler
+        msgs = first.msgs
+        if len(items) > 1:
+            from .message import AnyMsgSeg
+
+            separator = handler.assemble([AnyMsgSeg("text", "\n")])
+            merged = msgs[0].copy()
+            for item in items[1:]:
+                merged.extend(separator)
+                merged.extend(item.msgs[0])
+            msgs = [merged]
+        bucket = self._get_bucket(handler.platform)
+        recorded = False
+        try:
+            results = []
+            at = first.at
+            for msg in msgs:
+                if bucket:
+                    await bucket.acquire(first.priority)
+                if not recorded:
+                    recorded = True
+                    if all(item.future.done() for item in items):
+                        self._record(items, expired=True)
+                        return
+                    self._record(items)
+                    for item in items:
+                        item.started = True
+                if first.target:
+                    call = handler.send_to(first.bot, first.target, msg)
+                else:
+                    call = handler.send(first.bot, first.event, msg, at, first.reply)
+                if first.deadline is not None:
+                    call = with_deadline(call, "send", first.deadline)
+                start = time.perf_counter()
+                try:
+                    results.append(await call)
+                except Exception:
+                    metrics.send.observe(
+                        time.perf_counter() - start, handler.platform.name, "error"
+                    )
+                    raise
+                metrics.send.observe(
+                    time.perf_counter() - start, handler.platform.name, "ok"
+                )
+                at = False
+        except Exception as e:
+            for item in items:
+                if not item.future.done():
+                    item.future.set_exception(e)
+        else:
+            for item in items:
+                if not item.future.done():
+                    item.future.set_result(results)
+        finally:
+            if not recorded:
+                self._record(items)
+
+    def _record(self, items: list[_Outgoing], expired: bool = False) -> None:
+        now = asyncio.get_running_loop().time()
+        for item in items:
+            stats = self._stats[item.priority]
+            waited = now - item.submitted
+            stats.depth -= 1
+            if expired:
+                stats.expired += 1
+                continue
+            stats.sent += 1
+            stats.wait_total += waited
+            stats.wait_max = max(stats.wait_max, waited)
+
+
+outbound = Outbound()
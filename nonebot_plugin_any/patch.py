@@ -1,4 +1,5 @@
 import inspect
+import time
 from typing import Any, Optional, cast
 
 from nonebot.adapters import Event
@@ -13,6 +14,7 @@ from pydantic.fields import ModelField, Required
 from typing_extensions import Self, override
 
 from . import AnyEvent
+from .utils import metrics
 
 ANYEVENT_TARGET = "_any_event"
 
@@ -58,10 +60,16 @@ class AnyEventParam(Param):
 
     @override
     async def _check(self, event: "Event", state: T_State, **kwargs: Any) -> Any:
-        if not (any_event := state[ANYEVENT_TARGET]):
-            any_event = state[ANYEVENT_TARGET] = self.any_cls.solve(event)
-        if checker := self.extra.get("checker", None):
-            check_field_type(checker, any_event)
+        start = time.perf_counter()
+        try:
+            if not (any_event := state[ANYEVENT_TARGET]):
+                any_event = state[ANYEVENT_TARGET] = self.any_cls.solve(event)
+            if checker := self.extra.get("checker", None):
+                check_field_type(checker, any_event)
+        finally:
+            metrics.param_check.observe(
+                time.perf_counter() - start, self.any_cls.__name__
+            )
 
 
 @event_preprocessor
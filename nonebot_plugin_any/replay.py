@@ -0,0 +1,316 @@
+import asyncio
+import contextlib
+import gzip
+import json
+import time
+import weakref
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Any, Callable, Iterable, Iterator
+
+import nonebot
+from nonebot import get_driver
+from nonebot.adapters import Bot as BaseBot
+from nonebot.adapters import Event
+from nonebot.log import logger
+from nonebot.matcher import Matcher
+from nonebot.message import event_preprocessor, run_postprocessor, run_preprocessor
+from pydantic.json import pydantic_encoder
+
+from .config import plugin_config
+from .dedup import deduplicator
+from .patch import AnyEventParam
+from .serialize import _class_path, decode_event, encode_event
+from .utils.media import run_in_pool
+
+_FLUSH_INTERVAL = 1
+"录制缓冲写入磁盘的间隔，单位: 秒"
+
+
+class EventRecorder:
+    """
+    说明：
+
+        事件录制器，将收到的原始平台事件写入 gzip 压缩的 JSONL 分段文件
+
+        每行记录接收时间、Bot id、适配器名、事件类与事件数据，足以重建 NoneBot 事件；心跳等元事件不录制
+
+        事件先缓冲在内存中，定期在媒体线程池中批量写入
+
+    参数:
+
+        * ``directory``: 录制目录
+        * ``segment_size``: 每个分段文件的最大事件数
+
+    """
+
+    def __init__(self, directory: Path, segment_size: int = 10000) -> None:
+        self.directory = directory
+        self.segment_size = max(segment_size, 1)
+        self._buffer: list[str] = []
+        self._segment: Path | None = None
+        self._count = 0
+        self._flusher: asyncio.Task | None = None
+        self._lock = asyncio.Lock()
+
+    def record(self, bot: BaseBot, event: Event) -> None:
+        """
+        说明：
+
+            录制一个事件
+
+        参数:
+
+            * ``bot``: 收到事件的 Bot
+            * ``event``: 事件
+
+        """
+        if event.get_type() == "meta_event":
+            return
+        record = {
+            "t": time.time(),
+            "bot": bot.self_id,
+            "adapter": bot.adapter.get_name(),
+            "type": _class_path(type(event)),
+            "event": encode_event(event),
+        }
+        self._buffer.append(
+            json.dumps(
+                record,
+                ensure_ascii=False,
+                separators=(",", ":"),
+                default=pydantic_encoder,
+            )
+        )
+
+    def _next_segment(self) -> Path:
+        if self._segment is None or self._count >= self.segment_size:
+            self.directory.mkdir(parents=True, exist_ok=True)
+            name = time.strftime("events-%Y%m%d-%H%M%S")
+            index = 0
+            while (path := self.directory / f"{name}-{index}.jsonl.gz").exists():
+                index += 1
+            self._segment = path
+            self._count = 0
+        return self._segment
+
+    def _write(self, path: Path, lines: list[str]) -> None:
+        # 每次追加一个 gzip 成员，读取时按单个文件解压
+        with gzip.open(path, "at", encoding="utf-8") as file:
+            file.write("\n".join(lines) + "\n")
+
+    async def flush(self) -> None:
+        "将缓冲写入磁盘，同一时间只有一次写入"
+        async with self._lock:
+            while self._buffer:
+                path = self._next_segment()
+                lines = self._buffer[: self.segment_size - self._count]
+                del self._buffer[: len(lines)]
+                self._count += len(lines)
+                await run_in_pool(self._write, path, lines)
+
+    async def _run(self) -> None:
+        while True:
+            await asyncio.sleep(_FLUSH_INTERVAL)
+            try:
+                # 停止时不打断进行中的写入，由 stop 中的 flush 等待其完成
+                await asyncio.shield(self.flush())
+            except OSError as e:
+                logger.warning(f"写入事件录制 {self.directory} 失败: {e!r}")
+
+    def start(self) -> None:
+        if self._flusher is None or self._flusher.done():
+            self._flusher = asyncio.create_task(self._run())
+
+    async def stop(self) -> None:
+        if self._flusher:
+            self._flusher.cancel()
+            with contextlib.suppress(asyncio.CancelledError):
+                await self._flusher
+        await self.flush()
+
+
+def read_records(paths: Iterable[Path]) -> Iterator[dict[str, Any]]:
+    """
+    说明：
+
+        按顺序读取录制文件中的记录，跳过无法解析的行
+
+    参数:
+
+        * ``paths``: 录制文件或录制目录
+
+    """
+    for path in paths:
+        files = sorted(path.glob("*.jsonl.gz")) if path.is_dir() else [path]
+        for file in files:
+            with gzip.open(file, "rt", encoding="utf-8") as lines:
+                for line in lines:
+                    if not line.strip():
+                        continue
+                    try:
+                        yield json.loads(line)
+                    except ValueError as e:
+                        logger.warning(f"跳过 {file} 中无法解析的记录: {e!r}")
+
+
+def _is_any_matcher(matcher: type[Matcher]) -> bool:
+    return any(
+        isinstance(param.field_info, AnyEventParam)
+        for handler in matcher.handlers
+        for param in handler.params
+    )
+
+
+@dataclass
+class ReplayReport:
+    "回放结果"
+
+    events: int = 0
+    "回放的事件数"
+    skipped: int = 0
+    "无法还原而跳过的记录数"
+    elapsed: float = 0
+    "总耗时，单位: 秒"
+    latencies: dict[str, list[float]] = field(default_factory=dict)
+    "各使用 AnyEvent 的事件响应器每次运行的耗时，单位: 秒"
+
+    @property
+    def throughput(self) -> float:
+        "每秒处理的事件数"
+        return self.events / self.elapsed if self.elapsed else 0
+
+    def summary(self) -> str:
+        "可读的汇总"
+        lines = [
+            f"events={self.events} skipped={self.skipped} elapsed={self.elapsed:.3f}s "
+            f"throughput={self.throughput:.1f}/s"
+        ]
+        for name, samples in sorted(self.latencies.items()):
+            samples = sorted(samples)
+            lines.append(
+                f"{name}: n={len(samples)} "
+                f"avg={sum(samples) / len(samples) * 1000:.2f}ms "
+                f"p50={samples[len(samples) // 2] * 1000:.2f}ms "
+                f"p95={samples[int(len(samples) * 0.95)] * 1000:.2f}ms "
+                f"max={samples[-1] * 1000:.2f}ms"
+            )
+        return "\n".join(lines)
+
+
+def _default_bot(adapter: str, self_id: str) -> BaseBot:
+    return nonebot.get_bot(self_id)
+
+
+class Replayer:
+    """
+    说明：
+
+        事件回放器，将录制的事件按 NoneBot 的正常分发流程处理
+
+    参数:
+
+        * ``bot_factory``: 根据适配器名与 Bot id 获取回放所用的 Bot，默认使用已连接的同 id Bot
+
+    """
+
+    _active: "Replayer | None" = None
+
+    def __init__(
+        self, bot_factory: Callable[[str, str], BaseBot] = _default_bot
+    ) -> None:
+        self.bot_factory = bot_factory
+        self._report = ReplayReport()
+        self._started: weakref.WeakKeyDictionary[Matcher, float] = (
+            weakref.WeakKeyDictionary()
+        )
+
+    async def replay(
+        self, paths: Iterable[Path], speed: float | None = 1
+    ) -> ReplayReport:
+        """
+        说明：
+
+            回放录制的事件，等待全部处理完成后返回结果
+
+            开始前清空入站去重记录，同一进程中可多次回放同一录制
+
+            无法还原的记录被记录警告并跳过；回放中断时取消并等待已开始处理的事件
+
+        参数:
+
+            * ``paths``: 录制文件或录制目录
+            * ``speed``: 回放速度倍率，1 为按录制速度，为 None 则尽快回放
+
+        """
+        self._report = report = ReplayReport()
+        deduplicator.clear()
+        bots: dict[tuple[str, str], BaseBot] = {}
+        tasks: list[asyncio.Task] = []
+        loop = asyncio.get_running_loop()
+        Replayer._active = self
+        start = loop.time()
+        first: float | None = None
+        try:
+            for record in read_records(paths):
+                if speed:
+                    first = record["t"] if first is None else first
+                    delay = start + (record["t"] - first) / speed - loop.time()
+                    if delay > 0:
+                        await asyncio.sleep(delay)
+                try:
+                    key = (record["adapter"], record["bot"])
+                    event = decode_event(record["type"], record["event"])
+                except Exception as e:
+                    logger.warning(f"跳过无法还原的录制事件: {e!r}")
+                    report.skipped += 1
+                    continue
+                if (bot := bots.get(key)) is None:
+                    bot = bots[key] = self.bot_factory(*key)
+                tasks.append(asyncio.create_task(bot.handle_event(event)))
+                report.events += 1
+            await asyncio.gather(*tasks)
+        finally:
+            for task in tasks:
+                task.cancel()
+            await asyncio.gather(*tasks, return_exceptions=True)
+            report.elapsed = loop.time() - start
+            Replayer._active = None
+        return report
+
+    def _begin(self, matcher: Matcher) -> None:
+        if _is_any_matcher(type(matcher)):
+            self._started[matcher] = time.perf_counter()
+
+    def _end(self, matcher: Matcher) -> None:
+        if (started := self._started.pop(matcher, None)) is not None:
+            self._report.latencies.setdefault(repr(type(matcher)), []).append(
+                time.perf_counter() - started
+            )
+
+
+driver = get_driver()
+
+if plugin_config.any_record_dir is not None:
+    event_recorder = EventRecorder(
+        plugin_config.any_record_dir, plugin_config.any_record_segment
+    )
+    driver.on_startup(event_recorder.start)
+    driver.on_shutdown(event_recorder.stop)
+
+    @event_preprocessor
+    async def _(bot: BaseBot, event: Event):
+        if Replayer._active is None:
+            event_recorder.record(bot, event)
+
+
+@run_preprocessor
+async def _(matcher: Matcher):
+    if replayer := Replayer._active:
+        replayer._begin(matcher)
+
+
+@run_postprocessor
+async def _(matcher: Matcher):
+    if replayer := Replayer._active:
+        replayer._end(matcher)
@@ -0,0 +1,337 @@
+import importlib
+import json
+import zlib
+from base64 import b64decode, b64encode
+from io import BytesIO
+from pathlib import Path
+from typing import Any, Callable
+
+from nonebot.adapters import Event
+from pydantic.json import pydantic_encoder
+
+from .event import AnyEvent
+from .message import AnyMsg, AnyMsgSeg, NativeMedia
+from .utils import Platform
+from .utils.media import SpooledMedia, media_spool
+
+VERSION = 1
+"编码格式版本"
+MAGIC = b"ANY"
+"二进制编码的文件头"
+
+_SEG_TYPES = {"text": "t", "at": "a", "image": "i", "voice": "v"}
+_SEG_NAMES = {code: name for name, code in _SEG_TYPES.items()}
+_INLINE_LIMIT = 4 << 10
+"以 base64 内联的二进制媒体的最大字节数，更大的写入内容寻址临时文件"
+
+
+class SerializeError(ValueError):
+    """
+    说明：
+
+        无法编码或解码
+
+    """
+
+
+def _class_path(cls: type) -> str:
+    return f"{cls.__module__}:{cls.__qualname__}"
+
+
+def _import_class(path: str, base: type) -> type:
+    module, _, qualname = path.partition(":")
+    obj: Any = importlib.import_module(module)
+    for name in qualname.split("."):
+        obj = getattr(obj, name)
+    if not (isinstance(obj, type) and issubclass(obj, base)):
+        raise SerializeError(f"{path} 不是 {base.__name__} 的子类")
+    return obj
+
+
+def _dump_spooled(media: SpooledMedia) -> dict[str, Any]:
+    # 只记录管理信息，所有权由 `hand_over` 与解码时的 ``adopt`` 显式转移
+    return {
+        "path": str(media.path),
+        "spool": [media.temp, media.from_bytes, media.digest],
+    }
+
+
+def _dump_media(seg: AnyMsgSeg) -> dict[str, Any]:
+    data = seg.data
+    if seg.media is not None:
+        return _dump_spooled(seg.media)
+    if isinstance(data, str):
+        return {"url": data}
+    if isinstance(data, Path):
+        return {"path": str(data)}
+    if isinstance(data, (bytes, BytesIO)):
+        # 很小的二进制数据内联，其余按内容摘要写入临时文件目录并以路径引用，
+        # 内容相同时复用同一文件，文件不属于任何消息，由临时媒体池按配额淘汰
+        buffer = data if isinstance(data, bytes) else data.getvalue()
+        if len(buffer) <= _INLINE_LIMIT:
+            return {"b64": b64encode(buffer).decode()}
+        return {"path": str(media_spool.store(buffer))}
+    if isinstance(data, NativeMedia):
+        return {"native": data.platform.name, "ref": data.ref, "url": data.url}
+    raise SerializeError(f"不支持的媒体 {type(data)}")
+
+
+def _load_media(type: str, data: dict[str, Any], adopt: bool) -> AnyMsgSeg:
+    if "native" in data:
+        native = NativeMedia(Platform[data["native"]], data["ref"], data.get("url"))
+        return AnyMsgSeg(type, native)  # type: ignore
+    if "url" in data:
+        return AnyMsgSeg(type, data["url"])  # type: ignore
+    if "b64" in data:
+        return AnyMsgSeg(type, b64decode(data["b64"]))  # type: ignore
+    path = Path(data["path"])
+    if spool := data.get("spool"):
+        # 本进程已管理该文件时共享同一对象，避免出现多个所有者
+        media = media_spool.adopt(path, *spool) if adopt else media_spool.get(path)
+        if media is not None:
+            return AnyMsgSeg(type, media.path, media)  # type: ignore
+    return AnyMsgSeg(type, path)  # type: ignore
+
+
+def msg_to_dict(msg: AnyMsg) -> dict[str, Any]:
+    """
+    说明：
+
+        将 `AnyMsg` 编码为可 JSON 化的字典
+
+        媒体以网址或路径引用：很小的二进制数据以 base64 内联，其余按内容摘要写入临时文件目录
+
+        编码不改变媒体的所有权：由临时媒体池管理的媒体仍由本进程删除，
+        须转移给接收方时，在编码结果交出后调用 `hand_over`，接收方以 ``adopt=True`` 解码
+
+    参数:
+
+        * ``msg``: 消息
+
+    """
+    segs = []
+    for seg in msg._msg:
+        if seg.type in ("image", "voice"):
+            segs.append([_SEG_TYPES[seg.type], _dump_media(seg)])
+        else:
+            segs.append([_SEG_TYPES[seg.type], seg.data])
+    return {"v": VERSION, "kind": "msg", "segs": segs}
+
+
+def msg_from_dict(data: dict[str, Any], adopt: bool = False) -> AnyMsg:
+    """
+    说明：
+
+        从字典还原 `AnyMsg`
+
+    参数:
+
+        * ``data``: `msg_to_dict` 的结果
+        * ``adopt``: 是否接管由临时媒体池管理的媒体，仅在发送方已调用 `hand_over` 时使用. 默认为 False.
+
+    """
+    _check(data, "msg")
+    segs = []
+    for code, value in data["segs"]:
+        type = _SEG_NAMES[code]
+        if type in ("image", "voice"):
+            segs.append(_load_media(type, value, adopt))
+        else:
+            segs.append(AnyMsgSeg(type, value))  # type: ignore
+    return AnyMsg(segs)
+
+
+def hand_over(msg: AnyMsg) -> None:
+    """
+    说明：
+
+        放弃消息中由临时媒体池管理的媒体文件，文件不再被本进程删除
+
+        在编码结果已交给接收方后调用，接收方以 ``adopt=True`` 解码并接管这些文件
+
+    参数:
+
+        * ``msg``: 已编码的消息
+
+    """
+    for seg in msg._msg:
+        if seg.media is not None:
+            media_spool.hand_over(seg.media)
+
+
+_event_encoders: dict[type[Event], Callable[[Event], dict[str, Any]]] = {}
+
+
+def register_event_encoder(
+    event_cls: type[Event], encoder: Callable[[Event], dict[str, Any]]
+) -> None:
+    """
+    说明：
+
+        注册平台事件的编码函数，用于 `Event.dict` 的结果无法由 `parse_obj` 还原的适配器
+
+    参数:
+
+        * ``event_cls``: 事件基类，对其子类生效
+        * ``encoder``: 编码函数，返回可由 `parse_obj` 还原的字典
+
+    """
+    _event_encoders[event_cls] = encoder
+
+
+def encode_event(event: Event) -> dict[str, Any]:
+    """
+    说明：
+
+        将平台事件编码为可由 `parse_obj` 还原的字典，默认按字段别名导出
+
+    参数:
+
+        * ``event``: 平台事件
+
+    """
+    for cls in type(event).__mro__:
+        if encoder := _event_encoders.get(cls):
+            return encoder(event)
+    return event.dict(by_alias=True)
+
+
+def decode_event(type: str, data: dict[str, Any]) -> Event:
+    """
+    说明：
+
+        从 `encode_event` 的结果还原平台事件
+
+    参数:
+
+        * ``type``: 事件类路径
+        * ``data``: `encode_event` 的结果
+
+    """
+    return _import_class(type, Event).parse_obj(data)
+
+
+def event_to_dict(any_event: AnyEvent) -> dict[str, Any]:
+    """
+    说明：
+
+        将已解析的 `AnyEvent` 编码为可 JSON 化的字典，包含原始平台事件
+
+    参数:
+
+        * ``any_event``: 事件
+
+    """
+    return {
+        "v": VERSION,
+        "kind": "event",
+        "any": _class_path(type(any_event)),
+        "type": _class_path(type(any_event.event)),
+        "event": encode_event(any_event.event),
+    }
+
+
+def event_from_dict(data: dict[str, Any]) -> AnyEvent:
+    """
+    说明：
+
+        从字典还原 `AnyEvent`
+
+    参数:
+
+        * ``data``: `event_to_dict` 的结果
+
+    """
+    _check(data, "event")
+    any_cls = _import_class(data["any"], AnyEvent)
+    return any_cls(decode_event(data["type"], data["event"]))
+
+
+def _check(data: dict[str, Any], kind: str) -> None:
+    if data.get("kind") != kind:
+        raise SerializeError(f"不是 {kind} 的编码")
+    if data.get("v", 0) > VERSION:
+        raise SerializeError(f"不支持的编码版本 {data.get('v')}")
+
+
+def to_dict(obj: AnyMsg | AnyEvent) -> dict[str, Any]:
+    "将 `AnyMsg` 或 `AnyEvent` 编码为可 JSON 化的字典"
+    if isinstance(obj, AnyMsg):
+        return msg_to_dict(obj)
+    if isinstance(obj, AnyEvent):
+        return event_to_dict(obj)
+    raise SerializeError(f"不支持的类型 {type(obj)}")
+
+
+def from_dict(data: dict[str, Any], adopt: bool = False) -> AnyMsg | AnyEvent:
+    "从字典还原 `AnyMsg` 或 `AnyEvent`，``adopt`` 见 `msg_from_dict`"
+    if data.get("kind") == "msg":
+        return msg_from_dict(data, adopt)
+    return event_from_dict(data)
+
+
+def dumps(obj: AnyMsg | AnyEvent) -> str:
+    """
+    说明：
+
+        编码为 JSON 字符串
+
+    参数:
+
+        * ``obj``: `AnyMsg` 或已解析的 `AnyEvent`
+
+    """
+    return json.dumps(
+        to_dict(obj),
+        ensure_ascii=False,
+        separators=(",", ":"),
+        default=pydantic_encoder,
+    )
+
+
+def loads(data: str | bytes, adopt: bool = False) -> AnyMsg | AnyEvent:
+    """
+    说明：
+
+        从 JSON 字符串还原
+
+    参数:
+
+        * ``data``: `dumps` 的结果
+        * ``adopt``: 是否接管媒体，见 `msg_from_dict`. 默认为 False.
+
+    """
+    return from_dict(json.loads(data), adopt)
+
+
+def pack(obj: AnyMsg | AnyEvent) -> bytes:
+    """
+    说明：
+
+        编码为紧凑的二进制：文件头 `ANY` + 版本号（1 字节）+ zlib 压缩的 JSON
+
+    参数:
+
+        * ``obj``: `AnyMsg` 或已解析的 `AnyEvent`
+
+    """
+    return MAGIC + bytes([VERSION]) + zlib.compress(dumps(obj).encode())
+
+
+def unpack(data: bytes, adopt: bool = False) -> AnyMsg | AnyEvent:
+    """
+    说明：
+
+        从二进制还原
+
+    参数:
+
+        * ``data``: `pack` 的结果
+        * ``adopt``: 是否接管媒体，见 `msg_from_dict`. 默认为 False.
+
+    """
+    if data[: len(MAGIC)] != MAGIC:
+        raise SerializeError("不是有效的编码")
+    if data[len(MAGIC)] > VERSION:
+        raise SerializeError(f"不支持的编码版本 {data[len(MAGIC)]}")
+    return loads(zlib.decompress(data[len(MAGIC) + 1 :]), adopt)
@@ -0,0 +1,173 @@
+import asyncio
+import weakref
+from collections import Counter
+from typing import Literal, TypeVar
+
+from nonebot import get_driver
+from nonebot.adapters import Bot as BaseBot
+from nonebot.adapters import Event
+from nonebot.exception import IgnoredException
+from nonebot.log import logger
+from nonebot.matcher import Matcher
+from nonebot.message import run_postprocessor, run_preprocessor
+
+from .config import plugin_config
+from .event import AnyGroupEvent, AnyMsgEvent
+from .utils import platform_of
+
+TM = TypeVar("TM", bound=type[Matcher])
+
+_INTERVAL = 0.1
+"事件循环延迟采样间隔，单位: 秒"
+
+
+class LoadShedder:
+    """
+    说明：
+
+        过载时推迟或丢弃被标记为低优先级的事件响应器
+
+        过载的判断：事件循环延迟超过 `any_shed_lag`，或进行中的事件响应器数超过 `any_shed_inflight`，
+        或同一群聊（私聊为同一用户）进行中的事件响应器数超过 `any_shed_channel_inflight`
+
+    """
+
+    def __init__(self) -> None:
+        self.lag = 0.0
+        "事件循环延迟，单位: 秒"
+        self.counters: Counter[tuple[str, str]] = Counter()
+        "以 (动作, 群聊) 为键的计数，动作为 `dropped`、`deferred`"
+        self._modes: dict[type[Matcher], Literal["drop", "defer"]] = {}
+        self._inflight: weakref.WeakSet[Matcher] = weakref.WeakSet()
+        self._channels: dict[str, weakref.WeakSet[Matcher]] = {}
+        self._channel_of: weakref.WeakKeyDictionary[Matcher, str] = (
+            weakref.WeakKeyDictionary()
+        )
+        self._monitor: asyncio.Task | None = None
+
+    def mark(self, matcher: TM, mode: Literal["drop", "defer"] = "drop") -> TM:
+        """
+        说明：
+
+            将事件响应器标记为低优先级
+
+        参数:
+
+            * ``matcher``: 事件响应器
+            * ``mode``: 过载时的处理方式：`drop` 丢弃；`defer` 推迟至不再过载，超过 `any_shed_defer` 秒仍过载则丢弃
+
+        """
+        self._modes[matcher] = mode
+        return matcher
+
+    @property
+    def inflight(self) -> int:
+        "进行中的事件响应器数"
+        return len(self._inflight)
+
+    def overloaded(self, channel: str) -> bool:
+        "该群聊当前是否过载"
+        if plugin_config.any_shed_lag > 0 and self.lag > plugin_config.any_shed_lag:
+            return True
+        if 0 < plugin_config.any_shed_inflight <= self.inflight:
+            return True
+        limit = plugin_config.any_shed_channel_inflight
+        return 0 < limit <= len(self._channels.get(channel, ()))
+
+    def stats(self) -> dict[str, dict[str, int]]:
+        """
+        说明：
+
+            获取各群聊被推迟与被丢弃的事件数，如 `{"dropped": {"KOOK-123": 5}}`
+
+        """
+        result: dict[str, dict[str, int]] = {"dropped": {}, "deferred": {}}
+        for (action, channel), count in self.counters.items():
+            result[action][channel] = count
+        return result
+
+    @staticmethod
+    def channel_of(bot: BaseBot, event: Event) -> str:
+        "事件所属群聊的 `channel_rich_id`，私聊为 `user_rich_id`，都不是时为平台名"
+        try:
+            if any_event := AnyGroupEvent.solve(event):
+                return any_event.channel_rich_id
+            if any_event := AnyMsgEvent.solve(event):
+                return any_event.user_rich_id
+        except KeyError:
+            pass
+        platform = platform_of(type(bot))
+        return platform.name if platform else "unknown"
+
+    async def _admit(self, matcher: Matcher, bot: BaseBot, event: Event) -> None:
+        channel = self.channel_of(bot, event)
+        if (mode := self._modes.get(type(matcher))) and self.overloaded(channel):
+            if mode == "defer":
+                self.counters["deferred", channel] += 1
+                loop = asyncio.get_running_loop()
+                until = loop.time() + plugin_config.any_shed_defer
+                while self.overloaded(channel) and loop.time() < until:
+                    await asyncio.sleep(_INTERVAL)
+            if self.overloaded(channel):
+                self.counters["dropped", channel] += 1
+                logger.debug(f"过载，丢弃 {matcher} 对 {channel} 的处理")
+                raise IgnoredException("过载")
+        self._inflight.add(matcher)
+        self._channels.setdefault(channel, weakref.WeakSet()).add(matcher)
+        self._channel_of[matcher] = channel
+
+    def _done(self, matcher: Matcher) -> None:
+        # 被其他预处理器忽略的事件响应器不会经过后处理，由弱引用在其回收时移除
+        self._inflight.discard(matcher)
+        if (channel := self._channel_of.pop(matcher, None)) is None:
+            return
+        if (matchers := self._channels.get(channel)) is not None:
+            matchers.discard(matcher)
+            if not matchers:
+                del self._channels[channel]
+
+    async def _sample(self) -> None:
+        loop = asyncio.get_running_loop()
+        while True:
+            start = loop.time()
+            await asyncio.sleep(_INTERVAL)
+            sample = max(loop.time() - start - _INTERVAL, 0)
+            # 上升立即生效，下降逐步衰减，避免在阈值附近抖动
+            self.lag = sample if sample > self.lag else (self.lag + sample) / 2
+
+    def start(self) -> None:
+        if self._monitor is None or self._monitor.done():
+            self._monitor = asyncio.create_task(self._sample())
+
+    def stop(self) -> None:
+        if self._monitor:
+            self._monitor.cancel()
+
+
+load_shedder = LoadShedder()
+sheddable = load_shedder.mark
+"""
+说明：
+
+    将事件响应器标记为低优先级，过载时推迟或丢弃
+
+用法:
+
+    ```python
+    digest = sheddable(on_message(), mode="defer")
+    ```
+"""
+
+driver = get_driver()
+driver.on_startup(load_shedder.start)
+driver.on_shutdown(load_shedder.stop)
+
+
+@run_preprocessor
+async def _(matcher: Matcher, bot: BaseBot, event: Event):
+    await load_shedder._admit(matcher, bot, event)
+
+
+@run_postprocessor
+async def _(matcher: Matcher):
+    load_shedder._done(matcher)
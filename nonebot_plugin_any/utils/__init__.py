@@ -1,7 +1,7 @@
 import asyncio
 from enum import Enum, auto
 from functools import wraps
-from typing import Any, Callable, Coroutine, ParamSpec, TypeVar
+from typing import Any, Awaitable, Callable, Coroutine, Iterable, ParamSpec, TypeVar
 
 import nonebot
 from nonebot.adapters import Adapter as BaseAdapter
@@ -54,14 +54,32 @@ def class_cmp(cls1: type, cls2: type):
 bot2platform: dict[type[BaseBot], Platform] = {}
 platform2bot: dict[Platform, type[BaseBot]] = {}
 platform2adapter: dict[Platform, type[BaseAdapter]] = {}
+platform2throttle: dict[Platform, tuple[type[Exception], ...]] = {}
 
 
 def register_platform(
-    platform: Platform, bot: type[BaseBot], adapter: type[BaseAdapter]
+    platform: Platform,
+    bot: type[BaseBot],
+    adapter: type[BaseAdapter],
+    throttle: tuple[type[Exception], ...] = (),
 ):
+    """
+    说明：
+
+        注册平台
+
+    参数:
+
+        * ``platform``: 平台
+        * ``bot``: Bot 类
+        * ``adapter``: Adapter 类
+        * ``throttle``: 表示平台限流的异常类型
+
+    """
     bot2platform[bot] = platform
     platform2bot[platform] = bot
     platform2adapter[platform] = adapter
+    platform2throttle[platform] = throttle
 
 
 def get_platform_adapter(platform: Platform) -> type[BaseAdapter]:
@@ -81,6 +99,23 @@ def get_platform_adapter(platform: Platform) -> type[BaseAdapter]:
         raise NotSupportException("不支持的平台") from None
 
 
+def platform_of(bot_cls: type[BaseBot]) -> Platform | None:
+    """
+    说明：
+
+        获取 Bot 类所属的平台，已注册 Bot 类的子类属于同一平台
+
+    参数:
+
+        * ``bot_cls``: Bot 类
+
+    """
+    for cls in bot_cls.__mro__:
+        if (platform := bot2platform.get(cls)) is not None:
+            return platform
+    return None
+
+
 def get_current_platform(bot: BaseBot | None = None) -> Platform:
     """
     说明：
@@ -89,10 +124,9 @@ def get_current_platform(bot: BaseBot | None = None) -> Platform:
 
     """
     bot = bot or current_bot.get()
-    try:
-        return bot2platform[type(bot)]
-    except KeyError:
-        raise NotSupportException("不支持的平台") from None
+    if (platform := platform_of(type(bot))) is None:
+        raise NotSupportException("不支持的平台")
+    return platform
 
 
 def get_platform_bot_cls(platform: Platform) -> type[BaseBot]:
@@ -112,23 +146,37 @@ def get_platform_bot_cls(platform: Platform) -> type[BaseBot]:
         raise NotSupportException("不支持的平台") from None
 
 
-def get_platform_bot(platform: Platform) -> BaseBot:
+def get_platform_bot(platform: Platform, bot_id: str | None = None) -> BaseBot:
     """
     说明：
 
         获取该平台的 Bot 对象
 
+        优先使用指定的 Bot，其次是当前事件的 Bot，否则由 `bot_selector` 在已连接的 Bot 中选择
+
     参数:
 
         * ``platform``: 平台
+        * ``bot_id``: 指定 Bot 的 id
 
     """
-    bot = current_bot.get()
-    if not isinstance(bot, get_platform_bot_cls(platform)):
-        bot = next(
-            iter(nonebot.get_adapter(get_platform_adapter(platform)).bots.values())
-        )
-    return bot
+    bot_cls = get_platform_bot_cls(platform)
+    if bot_id is not None:
+        try:
+            bot = nonebot.get_bot(bot_id)
+        except KeyError:
+            raise NotSupportException(f"Bot {bot_id} 未连接") from None
+        if not isinstance(bot, bot_cls):
+            raise NotSupportException(f"Bot {bot_id} 不属于该平台")
+        return bot
+    bot = current_bot.get(None)
+    if isinstance(bot, bot_cls):
+        return bot
+    try:
+        adapter = nonebot.get_adapter(get_platform_adapter(platform))
+    except ValueError:
+        raise NotSupportException("该平台没有可用的 Bot") from None
+    return bot_selector.select(platform, list(adapter.bots.values()))
 
 
 class NotSupportException(Exception):
@@ -171,6 +219,7 @@ def async_retry(
                     i += 1
                     if max_tries != -1 and i >= max_tries:
                         raise e
+                    metrics.retries.inc(func.__qualname__)
                 if delay:
                     await asyncio.sleep(delay)
 
@@ -179,4 +228,43 @@ def async_retry(
     return wrap
 
 
+async def gather_bounded(
+    funcs: Iterable[Callable[[], Awaitable[Return]]], limit: int
+) -> list[Return]:
+    """
+    说明：
+
+        限制并发数地并发执行，结果顺序与输入一致
+
+        任一任务失败时立即取消其余任务并抛出该异常
+
+    参数:
+
+        * ``funcs``: 返回可等待对象的函数
+        * ``limit``: 最大并发数
+
+    """
+    semaphore = asyncio.Semaphore(max(limit, 1))
+
+    async def run(func: Callable[[], Awaitable[Return]]) -> Return:
+        async with semaphore:
+            return await func()
+
+    tasks = [asyncio.ensure_future(run(func)) for func in funcs]
+    if not tasks:
+        return []
+    try:
+        done, _ = await asyncio.wait(tasks, return_when=asyncio.FIRST_EXCEPTION)
+        for task in done:
+            if not task.cancelled() and (exc := task.exception()):
+                raise exc
+        return [task.result() for task in tasks]
+    finally:
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+
+
 from .requests import Requests as Requests
+from . import metrics as metrics
+from .selector import bot_selector as bot_selector
@@ -0,0 +1,219 @@
+import asyncio
+import hashlib
+import json
+from collections import OrderedDict
+from io import BytesIO
+from pathlib import Path
+from typing import Any, Awaitable, Callable, Generic, Hashable, TypeVar
+
+import httpx
+from nonebot import get_driver
+from nonebot.log import logger
+
+from ..config import plugin_config
+from . import Platform, metrics
+from .media import media_spool
+
+K = TypeVar("K", bound=Hashable)
+V = TypeVar("V")
+
+
+class LRUCache(Generic[K, V]):
+    """
+    说明：
+
+        简单的 LRU 缓存
+
+    参数:
+
+        * ``maxsize``: 最大条目数
+
+    """
+
+    def __init__(self, maxsize: int) -> None:
+        self.maxsize = maxsize
+        self._data: OrderedDict[K, V] = OrderedDict()
+
+    def __len__(self) -> int:
+        return len(self._data)
+
+    def __contains__(self, key: K) -> bool:
+        return key in self._data
+
+    def get(self, key: K, default: Any = None) -> V | Any:
+        try:
+            self._data.move_to_end(key)
+        except KeyError:
+            return default
+        return self._data[key]
+
+    def set(self, key: K, value: V) -> None:
+        self._data[key] = value
+        self._data.move_to_end(key)
+        while len(self._data) > self.maxsize:
+            self._data.popitem(last=False)
+
+    def pop(self, key: K, default: Any = None) -> V | Any:
+        return self._data.pop(key, default)
+
+    def items(self) -> list[tuple[K, V]]:
+        return list(self._data.items())
+
+    def clear(self) -> None:
+        self._data.clear()
+
+
+def media_key(data: str | Path | bytes | BytesIO) -> str:
+    """
+    说明：
+
+        计算媒体的缓存键
+
+            - `网址`: 规范化后的网址
+            - `路径`: 绝对路径 + 修改时间 + 大小，由二进制数据落盘而来的为其内容摘要
+            - `二进制数据`: BLAKE2 摘要
+
+    参数:
+
+        * ``data``: 媒体数据
+
+    """
+    if isinstance(data, str):
+        return f"url:{httpx.URL(data)}"
+    if isinstance(data, Path):
+        path = data.resolve()
+        if digest := media_spool.digest(path):
+            return f"blake2:{digest}"
+        stat = path.stat()
+        return f"path:{path}:{stat.st_mtime_ns}:{stat.st_size}"
+    buffer = data.getbuffer() if isinstance(data, BytesIO) else data
+    return f"blake2:{hashlib.blake2b(buffer, digest_size=20).hexdigest()}"
+
+
+def _media_size(data: str | Path | bytes | BytesIO) -> int:
+    if isinstance(data, str):
+        return 0
+    if isinstance(data, Path):
+        return data.stat().st_size
+    return data.getbuffer().nbytes if isinstance(data, BytesIO) else len(data)
+
+
+class UploadCache:
+    """
+    说明：
+
+        平台上传结果缓存，以媒体内容为键记录上传后得到的平台文件标识
+
+        同一内容的并发上传会合并为一次
+
+    参数:
+
+        * ``maxsize``: 最大条目数
+        * ``file``: 持久化文件，为空则不持久化
+
+    """
+
+    def __init__(self, maxsize: int, file: Path | None = None) -> None:
+        self.file = file
+        self._cache: LRUCache[str, str] = LRUCache(maxsize)
+        self._pending: dict[str, asyncio.Task[str]] = {}
+        self._waiters: dict[asyncio.Task[str], int] = {}
+
+    async def get_or_upload(
+        self,
+        platform: Platform,
+        data: str | Path | bytes | BytesIO,
+        upload: Callable[[], Awaitable[str]],
+        scope: str | None = None,
+    ) -> str:
+        """
+        说明：
+
+            获取缓存的上传结果，未命中时调用 ``upload`` 上传
+
+            上传在缓存持有的任务中进行，等待者被取消只是不再等待，不影响其他等待同一内容的发送；
+            所有等待者都被取消（如超过截止时间）时取消上传
+
+        参数:
+
+            * ``platform``: 平台
+            * ``data``: 媒体数据，用于计算缓存键
+            * ``upload``: 实际上传函数，返回平台文件标识
+            * ``scope``: 上传结果的归属，如上传所用 Bot 的 id，不同归属的结果分别缓存
+
+        """
+        owner = platform.name if scope is None else f"{platform.name}@{scope}"
+        key = f"{owner}:{media_key(data)}"
+        if (result := self._cache.get(key)) is not None:
+            metrics.cache.inc("upload", "hit")
+            return result
+        if (task := self._pending.get(key)) is not None:
+            metrics.cache.inc("upload", "shared")
+        else:
+            metrics.cache.inc("upload", "miss")
+            task = asyncio.create_task(self._upload(key, platform, data, upload))
+            # 所有等待者都已取消时避免 "exception was never retrieved"
+            task.add_done_callback(lambda t: t.cancelled() or t.exception())
+            self._pending[key] = task
+        self._waiters[task] = self._waiters.get(task, 0) + 1
+        try:
+            return await asyncio.shield(task)
+        finally:
+            self._leave(key, task)
+
+    def _leave(self, key: str, task: "asyncio.Task[str]") -> None:
+        if waiters := self._waiters[task] - 1:
+            self._waiters[task] = waiters
+            return
+        del self._waiters[task]
+        if not task.done():
+            # 没有发送再等待该内容，取消上传；之后的请求重新上传
+            task.cancel()
+            if self._pending.get(key) is task:
+                del self._pending[key]
+
+    async def _upload(
+        self,
+        key: str,
+        platform: Platform,
+        data: str | Path | bytes | BytesIO,
+        upload: Callable[[], Awaitable[str]],
+    ) -> str:
+        try:
+            result = await upload()
+        finally:
+            if self._pending.get(key) is asyncio.current_task():
+                del self._pending[key]
+        self._cache.set(key, result)
+        metrics.uploads.inc(platform.name)
+        metrics.upload_bytes.inc(platform.name, value=_media_size(data))
+        return result
+
+    def load(self) -> None:
+        "从持久化文件读取缓存"
+        if not self.file or not self.file.exists():
+            return
+        try:
+            for key, value in json.loads(self.file.read_text("utf-8")):
+                self._cache.set(key, value)
+        except (OSError, ValueError) as e:
+            logger.warning(f"读取上传缓存 {self.file} 失败: {e!r}")
+
+    def save(self) -> None:
+        "将缓存写入持久化文件"
+        if not self.file:
+            return
+        try:
+            self.file.parent.mkdir(parents=True, exist_ok=True)
+            self.file.write_text(json.dumps(self._cache.items()), "utf-8")
+        except OSError as e:
+            logger.warning(f"写入上传缓存 {self.file} 失败: {e!r}")
+
+
+upload_cache = UploadCache(
+    plugin_config.any_upload_cache_size, plugin_config.any_upload_cache_file
+)
+
+driver = get_driver()
+driver.on_startup(upload_cache.load)
+driver.on_shutdown(upload_cache.save)
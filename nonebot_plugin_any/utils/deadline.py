@@ -0,0 +1,93 @@
+import asyncio
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Awaitable, Iterator, TypeVar
+
+Return = TypeVar("Return")
+
+_deadline: ContextVar[float | None] = ContextVar("any_deadline", default=None)
+
+
+class DeadlineExceeded(asyncio.TimeoutError):
+    """
+    说明：
+
+        超过截止时间
+
+    参数:
+
+        * ``stage``: 超时的阶段，如 `prepare`（媒体下载、上传、编码）、`queue`（排队、限速）、`send`（平台 API 调用）
+
+    """
+
+    def __init__(self, stage: str) -> None:
+        super().__init__(f"超过截止时间，阶段: {stage}")
+        self.stage = stage
+
+
+@contextmanager
+def deadline(timeout: float | None) -> Iterator[None]:
+    """
+    说明：
+
+        设置截止时间，其中的构建与发送（包括并发的子任务）在截止时间到达时取消并抛出 `DeadlineExceeded`
+
+        嵌套时取较早的截止时间
+
+    参数:
+
+        * ``timeout``: 距现在的秒数，为 None 则不设置
+
+    """
+    if timeout is None:
+        yield
+        return
+    when = asyncio.get_running_loop().time() + timeout
+    if (current := _deadline.get()) is not None:
+        when = min(when, current)
+    token = _deadline.set(when)
+    try:
+        yield
+    finally:
+        _deadline.reset(token)
+
+
+def get_deadline() -> float | None:
+    "获取当前的截止时间（事件循环时间），未设置时返回 None"
+    return _deadline.get()
+
+
+def remaining(when: float | None) -> float | None:
+    "距截止时间的秒数，未设置时返回 None"
+    if when is None:
+        return None
+    return when - asyncio.get_running_loop().time()
+
+
+async def with_deadline(
+    aw: Awaitable[Return], stage: str, when: float | None = None
+) -> Return:
+    """
+    说明：
+
+        在截止时间内等待，超时则取消并抛出 `DeadlineExceeded`
+
+    参数:
+
+        * ``aw``: 可等待对象
+        * ``stage``: 阶段名
+        * ``when``: 截止时间，默认为当前的截止时间
+
+    """
+    if when is None:
+        when = _deadline.get()
+    if when is None:
+        return await aw
+    loop = asyncio.get_running_loop()
+    try:
+        return await asyncio.wait_for(aw, max(when - loop.time(), 0))
+    except asyncio.TimeoutError as e:
+        # 仅转换由截止时间引起的超时
+        if isinstance(e, DeadlineExceeded) or loop.time() < when:
+            raise
+        raise DeadlineExceeded(stage) from None
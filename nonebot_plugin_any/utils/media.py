@@ -0,0 +1,377 @@
+import asyncio
+import hashlib
+import shutil
+import tempfile
+import threading
+import time
+import weakref
+from collections import OrderedDict
+from base64 import b64encode
+from concurrent.futures import CancelledError, ThreadPoolExecutor
+from io import BytesIO
+from pathlib import Path
+from typing import Callable, TypeVar
+
+from nonebot import get_driver
+from nonebot.log import logger
+
+from ..config import plugin_config
+
+Return = TypeVar("Return")
+
+_executor = ThreadPoolExecutor(
+    max_workers=plugin_config.any_media_workers, thread_name_prefix="any-media"
+)
+_queue = asyncio.Semaphore(plugin_config.any_media_queue_size)
+_scratch_dir: Path | None = None
+_scratch_lock = threading.Lock()
+_SCRATCH_GRACE = 600
+"内容寻址临时文件在最近一次使用后至少保留的时间，单位: 秒，避免删除发送中的文件"
+
+
+async def run_in_pool(
+    func: Callable[..., Return], *args, cancel: threading.Event | None = None
+) -> Return:
+    """
+    说明：
+
+        在媒体线程池中执行阻塞操作（读文件、编码等）
+
+        排队中的任务数达到 `any_media_queue_size` 时等待；被取消时尚未开始的操作不再执行，
+        已开始的操作无法中断，可传入 ``cancel`` 由操作自行检查并提前结束
+
+    参数:
+
+        * ``func``: 阻塞函数
+        * ``args``: 参数
+        * ``cancel``: 被取消时置位的事件
+
+    """
+    async with _queue:
+        try:
+            return await asyncio.get_running_loop().run_in_executor(
+                _executor, func, *args
+            )
+        except asyncio.CancelledError:
+            if cancel is not None:
+                cancel.set()
+            raise
+
+
+def _to_bytes(data: Path | bytes | BytesIO) -> bytes:
+    if isinstance(data, Path):
+        return data.read_bytes()
+    if isinstance(data, BytesIO):
+        return data.getvalue()
+    return data
+
+
+_BASE64_CHUNK = 3 << 20
+"分块编码 base64 时每块的字节数，须为 3 的倍数"
+
+
+def encode_base64(
+    data: Path | bytes | BytesIO, cancel: threading.Event | None = None
+) -> str:
+    "读取并编码为 `base64://` 字符串，阻塞操作，``cancel`` 置位时在块之间中止"
+    buffer = memoryview(_to_bytes(data))
+    parts = ["base64://"]
+    for start in range(0, len(buffer), _BASE64_CHUNK):
+        if cancel is not None and cancel.is_set():
+            raise CancelledError
+        parts.append(b64encode(buffer[start : start + _BASE64_CHUNK]).decode())
+    return "".join(parts)
+
+
+def get_scratch_dir() -> Path:
+    "获取插件的临时文件目录，关闭时清理"
+    global _scratch_dir
+    with _scratch_lock:
+        if _scratch_dir is None:
+            _scratch_dir = Path(
+                tempfile.mkdtemp(
+                    prefix="nonebot_plugin_any_", dir=plugin_config.any_media_dir
+                )
+            )
+    return _scratch_dir
+
+
+def write_scratch(data: bytes | BytesIO) -> Path:
+    "以内容摘要为文件名写入临时文件目录，内容相同时复用，阻塞操作"
+    data = _to_bytes(data)
+    path = get_scratch_dir() / hashlib.blake2b(data, digest_size=20).hexdigest()
+    if not path.exists():
+        tmp = path.with_name(f"{path.name}.{threading.get_ident()}.tmp")
+        tmp.write_bytes(data)
+        tmp.replace(path)
+    return path
+
+
+def _write_spooled(data: bytes) -> tuple[Path, str]:
+    "写入以内容摘要为前缀的独占文件，返回路径与摘要，阻塞操作"
+    digest = hashlib.blake2b(data, digest_size=20).hexdigest()
+    fd, name = tempfile.mkstemp(prefix=f"{digest}-", dir=get_scratch_dir())
+    with open(fd, "wb") as file:
+        file.write(data)
+    return Path(name), digest
+
+
+def _unlink_written(task: "asyncio.Future[tuple[Path, str]]") -> None:
+    if not task.cancelled() and task.exception() is None:
+        task.result()[0].unlink(missing_ok=True)
+
+
+class SpooledMedia:
+    """
+    说明：
+
+        由 `MediaSpool` 管理的磁盘媒体文件
+
+        消息段持有该对象的引用，对象存活即表示仍有消息引用该文件，不会被淘汰
+
+        临时媒体在所有引用它的发送完成后删除，其余在不再被任何消息引用（对象被回收）时删除
+
+    """
+
+    __slots__ = (
+        "path",
+        "size",
+        "temp",
+        "from_bytes",
+        "digest",
+        "pins",
+        "_finalizer",
+        "__weakref__",
+    )
+
+    def __init__(
+        self,
+        spool: "MediaSpool",
+        path: Path,
+        size: int,
+        temp: bool,
+        from_bytes: bool,
+        digest: str | None = None,
+    ) -> None:
+        self.path = path
+        self.size = size
+        self.temp = temp
+        self.from_bytes = from_bytes
+        "是否由二进制数据写入而来"
+        self.digest = digest
+        "二进制数据的 BLAKE2 摘要，用作缓存键，内容相同的媒体摘要相同"
+        self.pins = 0
+        self._finalizer = weakref.finalize(self, spool._discard, path)
+
+    @property
+    def alive(self) -> bool:
+        "文件是否仍然存在"
+        return self._finalizer.alive
+
+    def delete(self) -> None:
+        "删除文件"
+        self._finalizer()
+
+
+class MediaSpool:
+    """
+    说明：
+
+        临时媒体池，负责临时媒体与大体积二进制媒体的落盘、引用计数与清理
+
+        总大小超过配额时，先淘汰最久未使用的内容寻址临时文件（不被任何消息引用，可按需重建），
+        仍超出时不再写入新的媒体，由调用方将二进制数据保留在内存中；仍被消息引用的媒体不会被删除
+
+    参数:
+
+        * ``quota``: 总大小配额，单位: 字节
+
+    """
+
+    def __init__(self, quota: int) -> None:
+        self.quota = quota
+        self.total = 0
+        self._entries: dict[Path, tuple[int, weakref.ref[SpooledMedia]]] = {}
+        self._scratch: OrderedDict[Path, tuple[int, float]] = OrderedDict()
+
+    async def write(
+        self, data: bytes | BytesIO, temp: bool = False
+    ) -> SpooledMedia | None:
+        """
+        说明：
+
+            将二进制数据写入临时文件目录，超出配额时返回 None
+
+            摘要计算与写入在媒体线程池中进行；被取消时已写入的文件会被删除
+
+        参数:
+
+            * ``data``: 二进制数据
+            * ``temp``: 是否为临时媒体
+
+        """
+        data = _to_bytes(data)
+        size = len(data)
+        if not self._reserve(size):
+            return None
+        # 写入期间预留配额，避免并发写入超出配额
+        self.total += size
+        task = asyncio.ensure_future(run_in_pool(_write_spooled, data))
+        try:
+            path, digest = await asyncio.shield(task)
+        except asyncio.CancelledError:
+            task.add_done_callback(_unlink_written)
+            raise
+        finally:
+            self.total -= size
+        return self._track(path, size, temp, True, digest)
+
+    def adopt(
+        self,
+        path: Path,
+        temp: bool = True,
+        from_bytes: bool = False,
+        digest: str | None = None,
+    ) -> SpooledMedia:
+        """
+        说明：
+
+            接管已存在的媒体文件，临时媒体在发送完成后删除，其余在对象被回收时删除
+
+            文件已在磁盘上，超出配额时仍然接管以保证其被清理，并记录警告
+
+        参数:
+
+            * ``path``: 文件路径
+            * ``temp``: 是否为临时媒体
+            * ``from_bytes``: 是否由二进制数据写入而来
+            * ``digest``: 已知的内容摘要
+
+        """
+        path = path.resolve()
+        if entry := self._entries.get(path):
+            if (media := entry[1]()) is not None:
+                return media
+        size = path.stat().st_size
+        if not self._reserve(size):
+            logger.warning(
+                f"临时媒体超出配额 {self.total + size}/{self.quota} 字节，仍接管 {path}"
+            )
+        return self._track(path, size, temp, from_bytes, digest)
+
+    async def write_scratch(self, data: bytes | BytesIO) -> Path:
+        """
+        说明：
+
+            以内容摘要为文件名写入临时文件目录，内容相同时复用，计入配额
+
+            文件不属于任何消息，超出配额时在最近一次使用的 `_SCRATCH_GRACE` 秒后可被淘汰
+
+        参数:
+
+            * ``data``: 二进制数据
+
+        """
+        return self._track_scratch(await run_in_pool(write_scratch, data))
+
+    def store(self, data: bytes | BytesIO) -> Path:
+        """
+        说明：
+
+            同 `write_scratch`，在当前线程写入，阻塞操作，用于无法等待的同步代码
+
+        参数:
+
+            * ``data``: 二进制数据
+
+        """
+        return self._track_scratch(write_scratch(data))
+
+    def get(self, path: Path) -> SpooledMedia | None:
+        "获取由本池管理的媒体，未管理或已被回收时返回 None"
+        if entry := self._entries.get(path):
+            return entry[1]()
+        return None
+
+    def _track_scratch(self, path: Path) -> Path:
+        if entry := self._scratch.pop(path, None):
+            size = entry[0]
+        else:
+            size = path.stat().st_size
+            self._reserve(size)
+            self.total += size
+        self._scratch[path] = (size, time.monotonic())
+        return path
+
+    def digest(self, path: Path) -> str | None:
+        "获取由本池管理的媒体文件的内容摘要，未知时返回 None"
+        if media := self.get(path):
+            return media.digest
+        return None
+
+    def hand_over(self, media: SpooledMedia) -> None:
+        """
+        说明：
+
+            放弃对媒体文件的管理，文件不再被本进程删除，由接收方通过 `adopt` 接管
+
+        参数:
+
+            * ``media``: 媒体
+
+        """
+        if media._finalizer.detach() and (entry := self._entries.pop(media.path, None)):
+            self.total -= entry[0]
+
+    def pin(self, *medias: SpooledMedia) -> None:
+        "标记媒体正在发送中"
+        for media in medias:
+            media.pins += 1
+
+    def release(self, *medias: SpooledMedia) -> None:
+        "标记媒体的一次发送已完成，临时媒体不再被发送引用时删除"
+        for media in medias:
+            media.pins -= 1
+            if media.temp and media.pins <= 0:
+                media.delete()
+
+    def _track(
+        self,
+        path: Path,
+        size: int,
+        temp: bool,
+        from_bytes: bool,
+        digest: str | None = None,
+    ) -> SpooledMedia:
+        media = SpooledMedia(self, path, size, temp, from_bytes, digest)
+        self._entries[path] = (size, weakref.ref(media))
+        self.total += size
+        return media
+
+    def _reserve(self, size: int) -> bool:
+        # 不再被引用的媒体已在回收时删除，其余均被消息引用，只能淘汰内容寻址临时文件
+        now = time.monotonic()
+        while self.total + size > self.quota and self._scratch:
+            path, (entry_size, used) = next(iter(self._scratch.items()))
+            if now - used < _SCRATCH_GRACE:
+                break
+            logger.debug(f"临时媒体超出配额，淘汰 {path}")
+            del self._scratch[path]
+            self.total -= entry_size
+            path.unlink(missing_ok=True)
+        return self.total + size <= self.quota
+
+    def _discard(self, path: Path) -> None:
+        if entry := self._entries.pop(path, None):
+            self.total -= entry[0]
+        path.unlink(missing_ok=True)
+
+
+media_spool = MediaSpool(plugin_config.any_media_spool_quota)
+
+
+@get_driver().on_shutdown
+def _cleanup() -> None:
+    _executor.shutdown(wait=False, cancel_futures=True)
+    if _scratch_dir is not None:
+        shutil.rmtree(_scratch_dir, ignore_errors=True)
@@ -0,0 +1,272 @@
+import bisect
+import time
+from contextlib import contextmanager
+from typing import Any, Iterator
+
+from nonebot import get_driver
+from nonebot.drivers import URL, HTTPServerSetup, Request, Response, ReverseDriver
+from nonebot.log import logger
+
+from ..config import plugin_config
+
+_TIME_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _format_labels(names: tuple[str, ...], values: tuple[str, ...]) -> str:
+    if not names:
+        return ""
+    pairs = ",".join(f'{n}="{_escape(v)}"' for n, v in zip(names, values))
+    return "{" + pairs + "}"
+
+
+class Counter:
+    """
+    说明：
+
+        计数器
+
+    参数:
+
+        * ``name``: 指标名
+        * ``help``: 说明
+        * ``labels``: 标签名
+
+    """
+
+    type = "counter"
+
+    def __init__(self, name: str, help: str, labels: tuple[str, ...] = ()) -> None:
+        self.name = name
+        self.help = help
+        self.labels = labels
+        self._values: dict[tuple[str, ...], float] = {}
+
+    def inc(self, *labels: str, value: float = 1) -> None:
+        "按标签值增加计数"
+        self._values[labels] = self._values.get(labels, 0) + value
+
+    def get(self, *labels: str) -> float:
+        "获取标签值对应的计数"
+        return self._values.get(labels, 0)
+
+    def snapshot(self) -> dict[tuple[str, ...], float]:
+        "获取所有标签值对应的计数"
+        return dict(self._values)
+
+    def render(self) -> Iterator[str]:
+        for labels, value in self._values.items():
+            yield f"{self.name}{_format_labels(self.labels, labels)} {value}"
+
+
+class Histogram:
+    """
+    说明：
+
+        直方图，记录观测值的分布、总和与次数
+
+    参数:
+
+        * ``name``: 指标名
+        * ``help``: 说明
+        * ``labels``: 标签名
+        * ``buckets``: 桶的上界，默认适用于以秒为单位的耗时
+
+    """
+
+    type = "histogram"
+
+    def __init__(
+        self,
+        name: str,
+        help: str,
+        labels: tuple[str, ...] = (),
+        buckets: tuple[float, ...] = _TIME_BUCKETS,
+    ) -> None:
+        self.name = name
+        self.help = help
+        self.labels = labels
+        self.buckets = tuple(sorted(buckets))
+        # 每个标签值: [各桶计数..., 超出所有桶的计数, 总和]
+        self._values: dict[tuple[str, ...], list[float]] = {}
+
+    def observe(self, value: float, *labels: str) -> None:
+        "按标签值记录一次观测"
+        if (data := self._values.get(labels)) is None:
+            data = self._values[labels] = [0] * (len(self.buckets) + 2)
+        data[bisect.bisect_left(self.buckets, value)] += 1
+        data[-1] += value
+
+    @contextmanager
+    def time(self, *labels: str) -> Iterator[None]:
+        "记录其中代码的耗时，单位: 秒"
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - start, *labels)
+
+    def snapshot(self) -> dict[tuple[str, ...], dict[str, Any]]:
+        """
+        说明：
+
+            获取所有标签值对应的统计，如 `{("KOOK",): {"count": 3, "sum": 0.5, "buckets": {0.001: 0, ...}}}`，桶计数为累计值
+
+        """
+        result = {}
+        for labels, data in self._values.items():
+            cumulative, buckets = 0, {}
+            for bound, count in zip(self.buckets, data):
+                cumulative += count
+                buckets[bound] = cumulative
+            result[labels] = {
+                "count": cumulative + data[-2],
+                "sum": data[-1],
+                "buckets": buckets,
+            }
+        return result
+
+    def render(self) -> Iterator[str]:
+        for labels, stats in self.snapshot().items():
+            for bound, count in stats["buckets"].items():
+                names, values = self.labels + ("le",), labels + (str(bound),)
+                yield f"{self.name}_bucket{_format_labels(names, values)} {count}"
+            names, values = self.labels + ("le",), labels + ("+Inf",)
+            yield f"{self.name}_bucket{_format_labels(names, values)} {stats['count']}"
+            label_text = _format_labels(self.labels, labels)
+            yield f"{self.name}_sum{label_text} {stats['sum']}"
+            yield f"{self.name}_count{label_text} {stats['count']}"
+
+
+class Registry:
+    """
+    说明：
+
+        指标注册表
+
+    """
+
+    def __init__(self) -> None:
+        self._metrics: dict[str, Counter | Histogram] = {}
+
+    def counter(self, name: str, help: str, labels: tuple[str, ...] = ()) -> Counter:
+        "创建并注册计数器"
+        metric = self._metrics[name] = Counter(name, help, labels)
+        return metric
+
+    def histogram(
+        self,
+        name: str,
+        help: str,
+        labels: tuple[str, ...] = (),
+        buckets: tuple[float, ...] = _TIME_BUCKETS,
+    ) -> Histogram:
+        "创建并注册直方图"
+        metric = self._metrics[name] = Histogram(name, help, labels, buckets)
+        return metric
+
+    def get(self, name: str) -> Counter | Histogram:
+        "按指标名获取指标"
+        return self._metrics[name]
+
+    def snapshot(self) -> dict[str, dict[tuple[str, ...], Any]]:
+        "获取所有指标的当前值"
+        return {name: metric.snapshot() for name, metric in self._metrics.items()}
+
+    def render(self) -> str:
+        "以 Prometheus 文本格式输出所有指标"
+        lines = []
+        for metric in self._metrics.values():
+            lines.append(f"# HELP {metric.name} {_escape(metric.help)}")
+            lines.append(f"# TYPE {metric.name} {metric.type}")
+            lines.extend(metric.render())
+        return "\n".join(lines) + "\n"
+
+
+registry = Registry()
+"插件的指标注册表"
+
+event_solve = registry.histogram(
+    "nonebot_any_event_solve_seconds",
+    "AnyEvent.solve 的耗时",
+    ("any_event", "result"),
+)
+param_check = registry.histogram(
+    "nonebot_any_param_check_seconds",
+    "AnyEvent 参数检查的耗时",
+    ("any_event",),
+)
+build = registry.histogram(
+    "nonebot_any_build_seconds",
+    "构建平台消息的总耗时",
+    ("platform",),
+)
+prepare = registry.histogram(
+    "nonebot_any_prepare_seconds",
+    "准备单个媒体消息段（下载、上传、编码）的耗时",
+    ("platform", "segment"),
+)
+uploads = registry.counter(
+    "nonebot_any_uploads_total",
+    "媒体上传次数",
+    ("platform",),
+)
+upload_bytes = registry.counter(
+    "nonebot_any_upload_bytes_total",
+    "媒体上传的字节数，不含网址媒体",
+    ("platform",),
+)
+send = registry.histogram(
+    "nonebot_any_send_seconds",
+    "单条平台消息发送 API 调用的耗时",
+    ("platform", "result"),
+)
+retries = registry.counter(
+    "nonebot_any_retries_total",
+    "失败后重试的次数",
+    ("func",),
+)
+cache = registry.counter(
+    "nonebot_any_cache_requests_total",
+    "缓存查询次数，命中率为 hit / (hit + miss)，shared 为合并到进行中的上传；"
+    "cache 为 upload、template 或事件元数据 user_info、group_info、channel_info",
+    ("cache", "result"),
+)
+
+
+def record_cache(name: str, value: Any) -> bool:
+    """
+    说明：
+
+        按缓存值是否存在记录一次缓存查询的命中或未命中，返回是否命中
+
+    参数:
+
+        * ``name``: 缓存名
+        * ``value``: 缓存值，为空表示未命中
+
+    """
+    hit = bool(value)
+    cache.inc(name, "hit" if hit else "miss")
+    return hit
+
+
+async def _handle_metrics(request: Request) -> Response:
+    return Response(
+        200,
+        headers={"Content-Type": "text/plain; version=0.0.4; charset=utf-8"},
+        content=registry.render(),
+    )
+
+
+if path := plugin_config.any_metrics_path:
+    driver = get_driver()
+    if isinstance(driver, ReverseDriver):
+        driver.setup_http_server(
+            HTTPServerSetup(URL(path), "GET", "nonebot_any_metrics", _handle_metrics)
+        )
+    else:
+        logger.warning(f"驱动器 {driver.type} 不支持 HTTP 服务，无法提供指标 {path}")
@@ -1,5 +1,6 @@
 from contextlib import asynccontextmanager
-from typing import Any, AsyncGenerator, Literal, Mapping
+from tempfile import SpooledTemporaryFile
+from typing import IO, Any, AsyncGenerator, Literal, Mapping
 
 import httpx
 from httpx import Headers, Response
@@ -475,6 +476,56 @@ class Requests:
         ) as response:
             yield response
 
+    @classmethod
+    @asynccontextmanager
+    async def download(
+        cls,
+        url: URLTypes,
+        *,
+        max_memory: int = 1 << 20,
+        chunk_size: int = 1 << 16,
+        timeout: TimeoutTypes = 30,
+        **kwargs,
+    ) -> AsyncGenerator[IO[bytes], None]:
+        """
+        说明:
+
+            流式下载到临时文件，超过 ``max_memory`` 的部分写入磁盘，退出上下文后删除
+
+            下载完成后才交给调用方，失败时与 `get` 一样最多尝试 3 次，每次从头下载
+
+        参数:
+
+            * ``url``: 请求地址
+            * ``max_memory``: 保留在内存中的最大字节数
+            * ``chunk_size``: 每次读取的块大小
+            * ``timeout``: 超时时间，单位: 秒
+            * ``kwargs``: 传递给 `Requests.stream` 的其他参数
+
+        """
+        with SpooledTemporaryFile(max_size=max_memory) as file:
+            await cls._download_to(file, url, chunk_size, timeout, **kwargs)
+            file.seek(0)
+            yield file  # type: ignore
+
+    @classmethod
+    @async_retry(max_tries=3)
+    async def _download_to(
+        cls,
+        file: IO[bytes],
+        url: URLTypes,
+        chunk_size: int,
+        timeout: TimeoutTypes,
+        **kwargs,
+    ) -> None:
+        # 重试前丢弃上次失败时已写入的部分
+        file.seek(0)
+        file.truncate()
+        async with cls.stream("GET", url, timeout=timeout, **kwargs) as response:
+            response.raise_for_status()
+            async for chunk in response.aiter_bytes(chunk_size):
+                file.write(chunk)
+
     @classmethod
     @asynccontextmanager
     async def client_session(
@@ -0,0 +1,153 @@
+import time
+from collections import deque
+from typing import Any, Literal
+
+import nonebot
+from nonebot.adapters import Bot as BaseBot
+
+from ..config import plugin_config
+from . import NotSupportException, Platform, platform2throttle, platform_of
+
+Strategy = Literal["round_robin", "least_outstanding", "health"]
+
+_STALE = 60
+"被取消的 API 调用不会触发 called 钩子，超过该秒数未完成的调用视为已结束"
+
+
+class BotState:
+    """
+    说明：
+
+        单个 Bot 的负载与健康状态
+
+    """
+
+    __slots__ = ("_inflight", "error_rate", "throttled_until")
+
+    def __init__(self) -> None:
+        self._inflight: deque[float] = deque()
+        self.error_rate = 0.0
+        "最近 API 调用的失败率（指数移动平均）"
+        self.throttled_until = 0.0
+        "被限流至该时间（`time.monotonic`）"
+
+    @property
+    def outstanding(self) -> int:
+        "进行中的 API 调用数"
+        stale = time.monotonic() - _STALE
+        while self._inflight and self._inflight[0] < stale:
+            self._inflight.popleft()
+        return len(self._inflight)
+
+    @property
+    def throttled(self) -> bool:
+        return time.monotonic() < self.throttled_until
+
+
+class BotSelector:
+    """
+    说明：
+
+        同一平台有多个 Bot 时，为不依赖事件的调用（上传、主动发送等）选择 Bot
+
+        跳过被限流的 Bot；全部被限流时选择最早恢复的
+
+            - `round_robin`: 轮流选择
+            - `least_outstanding`: 选择进行中 API 调用最少的
+            - `health`: 综合最近失败率与进行中 API 调用数
+
+    参数:
+
+        * ``strategy``: 选择策略
+
+    """
+
+    def __init__(self, strategy: Strategy) -> None:
+        self.strategy = strategy
+        self._states: dict[str, BotState] = {}
+        self._turn: dict[Platform, int] = {}
+
+    def state(self, bot: BaseBot) -> BotState:
+        "获取 Bot 的状态"
+        if (state := self._states.get(bot.self_id)) is None:
+            state = self._states[bot.self_id] = BotState()
+        return state
+
+    def throttle(self, bot: BaseBot, seconds: float) -> None:
+        """
+        说明：
+
+            标记 Bot 被限流，期间不会被选择
+
+        参数:
+
+            * ``bot``: Bot 对象
+            * ``seconds``: 限流时长，单位: 秒
+
+        """
+        state = self.state(bot)
+        state.throttled_until = max(state.throttled_until, time.monotonic() + seconds)
+
+    def select(self, platform: Platform, bots: list[BaseBot]) -> BaseBot:
+        """
+        说明：
+
+            从该平台的已连接 Bot 中选择一个
+
+        参数:
+
+            * ``platform``: 平台
+            * ``bots``: 候选 Bot
+
+        """
+        if not bots:
+            raise NotSupportException("该平台没有可用的 Bot")
+        # 轮转起点，使得分相同的 Bot 轮流被选中
+        turn = self._turn.get(platform, 0)
+        self._turn[platform] = turn + 1
+        start = turn % len(bots)
+        bots = bots[start:] + bots[:start]
+        if available := [bot for bot in bots if not self.state(bot).throttled]:
+            bots = available
+        else:
+            return min(bots, key=lambda bot: self.state(bot).throttled_until)
+        match self.strategy:
+            case "round_robin":
+                return bots[0]
+            case "least_outstanding":
+                return min(bots, key=lambda bot: self.state(bot).outstanding)
+            case "health":
+                return min(
+                    bots,
+                    key=lambda bot: (self.state(bot).outstanding + 1)
+                    * (1 + 10 * self.state(bot).error_rate),
+                )
+
+    async def _on_calling_api(self, bot: BaseBot, api: str, data: dict[str, Any]):
+        self.state(bot)._inflight.append(time.monotonic())
+
+    async def _on_called_api(
+        self,
+        bot: BaseBot,
+        exception: Exception | None,
+        api: str,
+        data: dict[str, Any],
+        result: Any,
+    ):
+        state = self.state(bot)
+        if state._inflight:
+            state._inflight.popleft()
+        state.error_rate = state.error_rate * 0.8 + (0.2 if exception else 0)
+        platform = platform_of(type(bot))
+        if exception and isinstance(exception, platform2throttle.get(platform, ())):
+            self.throttle(bot, plugin_config.any_bot_throttle_cooldown)
+
+    async def _on_bot_disconnect(self, bot: BaseBot) -> None:
+        self._states.pop(bot.self_id, None)
+
+
+bot_selector = BotSelector(plugin_config.any_bot_strategy)
+
+BaseBot.on_calling_api(bot_selector._on_calling_api)
+BaseBot.on_called_api(bot_selector._on_called_api)
+nonebot.get_driver().on_bot_disconnect(bot_selector._on_bot_disconnect)
@@ -0,0 +1,212 @@
+import asyncio
+import bisect
+import hashlib
+import multiprocessing
+import runpy
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+from typing import Any, Awaitable, Callable, TypeVar
+
+from nonebot import get_driver
+
+from .config import plugin_config
+from .event import AnyEvent, AnyGroupEvent, AnyMsgEvent
+from .message import AnyMsg, _spill
+from .serialize import hand_over, pack, unpack
+from .utils import media
+
+TE = TypeVar("TE", bound=AnyEvent)
+WorkerFunc = Callable[[TE], "AnyMsg | None | Awaitable[AnyMsg | None]"]
+
+
+def _hash(key: str) -> int:
+    return int.from_bytes(hashlib.blake2b(key.encode(), digest_size=8).digest(), "big")
+
+
+class HashRing:
+    """
+    说明：
+
+        一致性哈希环，节点数变化时只有少量键改变归属
+
+    参数:
+
+        * ``nodes``: 节点数
+        * ``replicas``: 每个节点的虚拟节点数
+
+    """
+
+    def __init__(self, nodes: int, replicas: int = 64) -> None:
+        ring = sorted(
+            (_hash(f"{node}-{i}"), node)
+            for node in range(nodes)
+            for i in range(replicas)
+        )
+        self._keys = [key for key, _ in ring]
+        self._nodes = [node for _, node in ring]
+
+    def get(self, key: str) -> int:
+        "获取键所属的节点"
+        return self._nodes[bisect.bisect(self._keys, _hash(key)) % len(self._keys)]
+
+
+def shard_key(any_event: AnyEvent) -> str:
+    "分片键：群聊为 `channel_rich_id`，私聊为 `user_rich_id`"
+    if isinstance(any_event, AnyGroupEvent):
+        return any_event.channel_rich_id
+    if isinstance(any_event, AnyMsgEvent):
+        return any_event.user_rich_id
+    return any_event.platform.name
+
+
+_WORKER_INIT = Path(__file__).with_name("_worker_init.py")
+
+
+def _worker_config() -> dict[str, Any]:
+    # 子进程不录制事件、不提供指标
+    return {
+        **plugin_config.dict(),
+        "any_record_dir": None,
+        "any_metrics_path": None,
+    }
+
+
+def _run(func: WorkerFunc, data: bytes) -> bytes | None:
+    result = func(unpack(data))
+    if asyncio.iscoroutine(result):
+        result = asyncio.run(result)
+    if result is None:
+        return None
+    # 大的二进制媒体写入临时媒体目录，以路径传递
+    asyncio.run(_spill(result._msg))  # type: ignore
+    data = pack(result)  # type: ignore
+    # 回复中的临时媒体文件交由主进程管理
+    hand_over(result)  # type: ignore
+    return data
+
+
+class WorkerPool:
+    """
+    说明：
+
+        进程池，在子进程中执行 CPU 密集的事件处理
+
+        按事件的群聊（私聊为用户）一致性哈希分配到固定的子进程，每个子进程串行执行，保证同一群聊的处理顺序
+
+        事件与回复以 `serialize` 编码传递，回复的 `AnyMsg` 在主进程中发送
+
+    参数:
+
+        * ``processes``: 子进程数
+        * ``mp_context``: multiprocessing 启动方式
+
+    """
+
+    def __init__(self, processes: int = 2, mp_context: str = "spawn") -> None:
+        self.processes = max(processes, 1)
+        self.mp_context = mp_context
+        self._ring = HashRing(self.processes)
+        self._executors: list[ProcessPoolExecutor] = []
+
+    def shard(self, any_event: AnyEvent) -> int:
+        "获取事件所属的子进程序号"
+        return self._ring.get(shard_key(any_event))
+
+    def _get_executor(self, index: int) -> ProcessPoolExecutor:
+        if not self._executors:
+            context = multiprocessing.get_context(self.mp_context)
+            init_globals = {
+                "config": _worker_config(),
+                "scratch_dir": media.get_scratch_dir(),
+            }
+            self._executors = [
+                ProcessPoolExecutor(
+                    1,
+                    mp_context=context,
+                    initializer=runpy.run_path,
+                    initargs=(str(_WORKER_INIT), init_globals),
+                )
+                for _ in range(self.processes)
+            ]
+        return self._executors[index]
+
+    async def run(self, func: WorkerFunc[TE], any_event: TE) -> AnyMsg | None:
+        """
+        说明：
+
+            在子进程中执行 ``func(any_event)``，返回其回复
+
+        参数:
+
+            * ``func``: 处理函数，须为可被子进程导入的模块级函数，可以是异步函数，返回 `AnyMsg` 或 None
+            * ``any_event``: 已解析的事件
+
+        """
+        executor = self._get_executor(self.shard(any_event))
+        data = await asyncio.get_running_loop().run_in_executor(
+            executor, _run, func, pack(any_event)
+        )
+        return None if data is None else unpack(data, adopt=True)  # type: ignore
+
+    async def dispatch(
+        self, func: WorkerFunc[TE], any_event: TE, **kwargs: Any
+    ) -> None:
+        """
+        说明：
+
+            在子进程中执行 ``func(any_event)``，并在当前事件中发送其回复
+
+        参数:
+
+            * ``func``: 处理函数
+            * ``any_event``: 已解析的事件
+            * ``kwargs``: 传递给 `AnyMsg.send` 的参数
+
+        """
+        if msg := await self.run(func, any_event):
+            await msg.send(**kwargs)
+
+    def shutdown(self) -> None:
+        "关闭所有子进程"
+        for executor in self._executors:
+            executor.shutdown(wait=False, cancel_futures=True)
+        self._executors = []
+
+
+_pools: list[WorkerPool] = []
+
+
+def worker_pool(processes: int = 2, mp_context: str = "spawn") -> WorkerPool:
+    """
+    说明：
+
+        创建进程池，子进程在首次使用时启动，NoneBot 关闭时关闭
+
+    参数:
+
+        * ``processes``: 子进程数
+        * ``mp_context``: multiprocessing 启动方式
+
+    用法:
+
+        ```python
+        pool = worker_pool(4)
+
+        def draw(event: AnyGroupMsgEvent) -> AnyMsg:
+            return AnyMsg().image(render(event.plaintext))
+
+        @matcher.handle()
+        async def _(event: AnyGroupMsgEvent):
+            await pool.dispatch(draw, event)
+        ```
+
+    """
+    pool = WorkerPool(processes, mp_context)
+    _pools.append(pool)
+    return pool
+
+
+@get_driver().on_shutdown
+def _shutdown() -> None:
+    for pool in _pools:
+        pool.shutdown()
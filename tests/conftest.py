@@ -0,0 +1,10 @@
+import nonebot
+from nonebot.adapters.kaiheila import Adapter as KookAdapter
+from nonebot.adapters.onebot.v11 import Adapter as OneBotV11Adapter
+from nonebot.adapters.qq import Adapter as QQAdapter
+
+nonebot.init(driver="~fastapi+~httpx+~websockets")
+driver = nonebot.get_driver()
+for adapter in (OneBotV11Adapter, KookAdapter, QQAdapter):
+    driver.register_adapter(adapter)
+nonebot.load_plugin("nonebot_plugin_any")
@@ -0,0 +1,37 @@
+import asyncio
+
+from nonebot_plugin_any.utils import Platform
+from nonebot_plugin_any.utils.cache import UploadCache
+
+
+def test_upload_shared_until_last_waiter_leaves():
+    async def main() -> None:
+        cache = UploadCache(16)
+        started = asyncio.Event()
+        cancelled = asyncio.Event()
+
+        async def upload() -> str:
+            started.set()
+            try:
+                await asyncio.sleep(0.2)
+            except asyncio.CancelledError:
+                cancelled.set()
+                raise
+            return "key"
+
+        first = asyncio.create_task(cache.get_or_upload(Platform.KOOK, b"x", upload))
+        second = asyncio.create_task(cache.get_or_upload(Platform.KOOK, b"x", upload))
+        await started.wait()
+        first.cancel()
+        assert await second == "key"
+        assert not cancelled.is_set()
+
+        third = asyncio.create_task(cache.get_or_upload(Platform.KOOK, b"y", upload))
+        await asyncio.sleep(0.05)
+        third.cancel()
+        await asyncio.wait([third])
+        await asyncio.sleep(0)
+        assert cancelled.is_set()
+        assert not cache._pending and not cache._waiters
+
+    asyncio.run(main())
@@ -0,0 +1,38 @@
+from nonebot.adapters.onebot.v11 import GroupMessageEvent, Message
+
+from nonebot_plugin_any import AnyGroupMsgEvent
+from nonebot_plugin_any.dedup import Deduplicator
+from nonebot_plugin_any.fake import fake_bot
+from nonebot_plugin_any.utils import Platform
+
+
+def group_event(self_id: int, message_id: int, text: str = "hi") -> GroupMessageEvent:
+    message = Message(text)
+    return GroupMessageEvent(
+        time=1700000000,
+        self_id=self_id,
+        post_type="message",
+        sub_type="normal",
+        user_id=1,
+        message_type="group",
+        message_id=message_id,
+        message=message,
+        original_message=message,
+        raw_message=text,
+        font=0,
+        sender={"user_id": 1},
+        to_me=False,
+        group_id=5,
+    )
+
+
+def test_group_key_ignores_per_account_message_id():
+    first = fake_bot(Platform.OneBotV11, "10", connect=False)
+    second = fake_bot(Platform.OneBotV11, "11", connect=False)
+    key = Deduplicator.key(first, AnyGroupMsgEvent.solve(group_event(10, 3)))
+    assert key == Deduplicator.key(
+        second, AnyGroupMsgEvent.solve(group_event(11, 42))
+    )
+    assert key != Deduplicator.key(
+        second, AnyGroupMsgEvent.solve(group_event(11, 42, "other"))
+    )
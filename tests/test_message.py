@@ -0,0 +1,60 @@
+from nonebot_plugin_any import AnyMsg
+from nonebot_plugin_any.message import AnyMsgHandler, AnyMsgSeg, NativeMedia, merge_text
+from nonebot_plugin_any.utils import Platform
+
+
+def test_text_merged():
+    msg = AnyMsg("a").text("b")
+    msg._msg
+    msg.text("c").at("1").text("d")
+    segs = list(merge_text(msg._msg))
+    assert [(seg.type, seg.data) for seg in segs] == [
+        ("text", "abc"),
+        ("at", "1"),
+        ("text", "d"),
+    ]
+
+
+def test_pending_text_joined_once():
+    msg = AnyMsg()
+    for _ in range(1000):
+        msg.text("line\n")
+    # 连续追加的文本块在读取时一次拼接为一个消息段
+    assert msg._msg == [AnyMsgSeg("text", "line\n" * 1000)]
+    assert msg._text == []
+
+
+def test_read_does_not_rejoin_text():
+    msg = AnyMsg()
+    segs = []
+    for i in range(100):
+        msg.text(str(i))
+        segs = msg._msg
+    # 交替追加与读取时，已生成的文本消息段不会被重新拼接
+    assert [seg.data for seg in segs] == [str(i) for i in range(100)]
+    msg.text("x")
+    assert all(a is b for a, b in zip(segs, msg._msg))
+    assert "".join(seg.data for seg in merge_text(msg._msg)) == "".join(
+        str(i) for i in range(100)
+    ) + "x"
+
+
+def test_partition_counts_platform_media():
+    segs = AnyMsg("hi").image("http://x/a.png").voice("http://x/a.mp3")._msg
+    # QQ 的语音以文本占位发送，不占用单条消息的图片名额
+    assert len(AnyMsgHandler.get_handler(Platform.QQ).partition(segs)) == 1
+    segs = AnyMsg("hi").image("http://x/a.png").image("http://x/b.png")._msg
+    assert len(AnyMsgHandler.get_handler(Platform.QQ).partition(segs)) == 2
+
+
+def test_kook_assemble_parse_round_trip():
+    handler = AnyMsgHandler.get_handler(Platform.KOOK)
+    image = "https://img.kookapp.cn/a.png"
+    voice = "https://img.kookapp.cn/a.mp3"
+    segs = [
+        AnyMsgSeg("text", "hi"),
+        AnyMsgSeg("at", "u1"),
+        AnyMsgSeg("image", NativeMedia(Platform.KOOK, image, image)),
+        AnyMsgSeg("voice", NativeMedia(Platform.KOOK, voice, voice)),
+    ]
+    assert handler.parse(handler.assemble(segs)) == segs
@@ -0,0 +1,142 @@
+import asyncio
+import gc
+import time
+
+import pytest
+from nonebot.adapters import Event
+from nonebot.adapters.kaiheila import Adapter as KookAdapter
+from nonebot.adapters.onebot.v11 import GroupMessageEvent, Message
+from nonebot.adapters.qq.event import GroupAtMessageCreateEvent
+
+from nonebot_plugin_any import AnyGroupMsgEvent, AnyMsg, serialize
+from nonebot_plugin_any.message import _spill
+
+
+def onebot_event() -> Event:
+    message = Message("hi[CQ:image,file=a.image,url=http://x/a.png]")
+    return GroupMessageEvent(
+        time=int(time.time()),
+        self_id=10,
+        post_type="message",
+        sub_type="normal",
+        user_id=1,
+        message_type="group",
+        message_id=3,
+        message=message,
+        original_message=message,
+        raw_message="hi",
+        font=0,
+        sender={"user_id": 1, "nickname": "n"},
+        to_me=False,
+        group_id=5,
+    )
+
+
+def kook_event() -> Event:
+    author = {
+        "id": "u1",
+        "username": "u",
+        "identify_num": "1",
+        "online": True,
+        "avatar": "",
+        "vip_avatar": "",
+        "bot": False,
+        "status": 0,
+        "nickname": "u",
+        "roles": [],
+    }
+    extra = {
+        "type": 9,
+        "guild_id": "g",
+        "channel_name": "c",
+        "mention": [],
+        "mention_all": False,
+        "mention_roles": [],
+        "mention_here": False,
+        "kmarkdown": {
+            "raw_content": "hi x",
+            "mention_part": [],
+            "mention_role_part": [],
+        },
+        "author": author,
+    }
+    data = {
+        "channel_type": "GROUP",
+        "type": 9,
+        "target_id": "c1",
+        "author_id": "u1",
+        "content": "hi **x**",
+        "msg_id": "m1",
+        "msg_timestamp": 1700000000000,
+        "nonce": "",
+        "extra": extra,
+    }
+    event = KookAdapter.json_to_event({"s": 0, "sn": 1, "d": data}, "2")
+    assert event is not None
+    return event
+
+
+def qq_event() -> Event:
+    return GroupAtMessageCreateEvent.parse_obj(
+        {
+            "__type__": "GROUP_AT_MESSAGE_CREATE",
+            "id": "m1",
+            "content": "hey",
+            "timestamp": "2024-01-01T00:00:00+08:00",
+            "author": {"id": "u", "member_openid": "mo"},
+            "group_openid": "g1",
+            "event_id": "e",
+        }
+    )
+
+
+@pytest.mark.parametrize("factory", [onebot_event, kook_event, qq_event])
+@pytest.mark.parametrize(
+    "codec",
+    [(serialize.dumps, serialize.loads), (serialize.pack, serialize.unpack)],
+    ids=["json", "binary"],
+)
+def test_event_round_trip(factory, codec):
+    event = factory()
+    any_event = AnyGroupMsgEvent.solve(event)
+    assert any_event is not None
+    dump, load = codec
+    restored = load(dump(any_event))
+    assert type(restored) is type(any_event)
+    assert restored.event == event
+    assert restored.user_rich_id == any_event.user_rich_id
+    assert restored.plaintext == any_event.plaintext
+    assert restored.message_id == any_event.message_id
+
+
+def spooled_msg() -> AnyMsg:
+    msg = AnyMsg().image(b"x" * (2 << 20)).image(b"y" * 10)
+    asyncio.run(_spill(msg._msg))
+    return msg
+
+
+def test_msg_encoding_keeps_ownership():
+    msg = spooled_msg()
+    path = msg._msg[0].media.path
+    data = serialize.pack(msg)
+    restored = serialize.unpack(data)
+    assert restored._msg[0].media is msg._msg[0].media
+    assert restored._msg[1].data == b"y" * 10
+    del msg, restored
+    gc.collect()
+    assert not path.exists()
+
+
+def test_msg_hand_over():
+    msg = spooled_msg()
+    path = msg._msg[0].media.path
+    data = serialize.pack(msg)
+    serialize.hand_over(msg)
+    del msg
+    gc.collect()
+    assert path.exists()
+    restored = serialize.unpack(data, adopt=True)
+    assert restored._msg[0].media is not None
+    del restored
+    gc.collect()
+    assert not path.exists()